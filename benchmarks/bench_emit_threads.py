@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+Measures how many records per second application threads can hand to a
+buffered GraylogHandler as the number of logging threads grows.
+
+Compares the default buffered path, where logging.Handler.handle serializes
+every thread on the handler's lock and all threads share one queue, with
+`sharded=True`, where each thread appends to its own buffer. Records are
+shipped over UDP to a port nobody reads. The rate counts only records
+actually sent, over the time from the first logging call until the handler
+has flushed, and the records dropped along the way are reported beside it.
+
+Usage:
+  python -m benchmarks.bench_emit_threads [records per thread]
+"""
+
+import logging
+import socket
+import sys
+import threading
+import time
+
+from graylogging.graylogging import GraylogHandler
+
+
+def _free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure(threads, count, sharded):
+    handler = GraylogHandler(
+        "127.0.0.1",
+        port=_free_udp_port(),
+        transport="udp",
+        buffered=True,
+        sharded=sharded,
+        queue_size=threads * count,
+    )
+    logger = logging.getLogger(f"bench.emit.{sharded}.{threads}")
+    logger.propagate = False
+    logger.handlers = [handler]
+    start = threading.Barrier(threads + 1)
+
+    def log():
+        start.wait()
+        for i in range(count):
+            logger.warning("request %s finished in %d ms", "/api/v1/items", i)
+
+    workers = [threading.Thread(target=log) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    handler.flush()
+    elapsed = time.perf_counter() - started
+    stats = handler.batch_settings()
+    handler.close()
+    return stats["sent"] / elapsed, stats["dropped"] + stats["failed"]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(
+        f"{'threads':<10}{'locked rec/s':>16}{'lost':>10}"
+        f"{'sharded rec/s':>16}{'lost':>10}"
+    )
+    for threads in (1, 2, 4, 8, 16, 32, 64):
+        locked, locked_lost = measure(threads, count, sharded=False)
+        sharded, sharded_lost = measure(threads, count, sharded=True)
+        print(
+            f"{threads:<10}{locked:>16.0f}{locked_lost:>10}"
+            f"{sharded:>16.0f}{sharded_lost:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+Measures the memory held per queued log entry by a buffered GraylogHandler.
+
+Compares keeping whole LogRecords (what a naive queue would hold) with the
+CompactRecords the handler actually queues, for plain messages and for
+records carrying an exception.
+
+Usage:
+  python -m benchmarks.bench_queue_memory [count]
+"""
+
+import logging
+import sys
+import tracemalloc
+
+from graylogging.records import CompactRecord
+
+
+def _deep_call(depth):
+    payload = [0] * 256  # noqa: F841 - kept alive by the traceback's frames
+    if depth:
+        return _deep_call(depth - 1)
+    raise ValueError("boom")
+
+
+def _make_record(i, with_exc):
+    exc_info = None
+    if with_exc:
+        try:
+            _deep_call(10)
+        except ValueError:
+            exc_info = sys.exc_info()
+    return logging.LogRecord(
+        "bench.queue",
+        logging.ERROR if with_exc else logging.INFO,
+        __file__,
+        i,
+        "request %s finished in %d ms",
+        ("/api/v1/items", i),
+        exc_info,
+        func="handle",
+    )
+
+
+def measure(count, with_exc, capture):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    queued = [capture(_make_record(i, with_exc)) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del queued
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"{'entry':<16}{'exception':<12}{'bytes/entry':>12}")
+    for with_exc in (False, True):
+        for label, capture in (
+            ("LogRecord", lambda r: r),
+            ("CompactRecord", CompactRecord),
+        ):
+            per_entry = measure(count, with_exc, capture)
+            print(f"{label:<16}{str(with_exc):<12}{per_entry:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
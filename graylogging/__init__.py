@@ -1,3 +1,5 @@
 #!/usr/bin/env python
 # -*- encoding: utf-8 -*-
 from graylogging.graylogging import GraylogFormatter, GraylogHandler  # noqa: F401
+from graylogging.fanout import GraylogFanoutHandler  # noqa: F401
+from graylogging.routing import GraylogRoutingHandler  # noqa: F401
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+import sys
+
+from graylogging.shipper import main
+
+sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import Tuple
+
+
+class AdaptiveBatchController:
+    """
+    Tunes a ShippingPipeline's batch size and linger time from what it
+    observes after every send.
+
+    The controller moves between two regimes. When the queue is backing up
+    or batches leave full, it grows the batch size and lets batches linger
+    about as long as a send takes, trading latency for throughput. When the
+    queue is idle and batches leave mostly empty, it shrinks both so that
+    quiet services see their records in Graylog promptly. Failed sends halve
+    the batch size and slow the send rate down. All settings stay within the
+    configured bounds.
+    """
+
+    # Fraction of the queue in use above which we favor throughput
+    HIGH_WATER = 0.25
+    # Weight given to the newest observation in the moving averages
+    SMOOTHING = 0.2
+
+    def __init__(
+        self,
+        batch_bounds: Tuple[int, int] = (1, 500),
+        linger_bounds: Tuple[float, float] = (0.0, 0.5),
+    ) -> None:
+        """
+        Initialize a controller at the low-latency end of its bounds.
+
+        Args:
+          batch_bounds: A tuple of the smallest and largest batch sizes
+              (optional, defaults to 1 and 500)
+          linger_bounds: A tuple of the shortest and longest linger times in
+              seconds (optional, defaults to 0 and 0.5)
+        Returns:
+          An instantiated AdaptiveBatchController object.
+        Raises:
+          ValueError: The bounds are empty or negative
+        """
+        min_batch, max_batch = batch_bounds
+        min_linger, max_linger = linger_bounds
+        if not 1 <= min_batch <= max_batch:
+            raise ValueError(f"{batch_bounds} are not valid batch size bounds")
+        if not 0 <= min_linger <= max_linger:
+            raise ValueError(f"{linger_bounds} are not valid linger bounds")
+        self.min_batch, self.max_batch = min_batch, max_batch
+        self.min_linger, self.max_linger = min_linger, max_linger
+        self.batch_size = min_batch
+        self.linger = min_linger
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self._lock = threading.Lock()
+
+    def _clamp_batch(self, size: float) -> int:
+        """"""
+        return int(min(self.max_batch, max(self.min_batch, size)))
+
+    def _clamp_linger(self, linger: float) -> float:
+        """"""
+        return min(self.max_linger, max(self.min_linger, linger))
+
+    def observe(
+        self, sent: int, latency: float, ok: bool, queued: int, capacity: int
+    ) -> Tuple[int, float]:
+        """
+        Record the outcome of a send and compute the next settings.
+
+        Args:
+          sent: An integer specifying how many records the batch held
+          latency: A float specifying how many seconds the send took
+          ok: A boolean specifying whether the send succeeded
+          queued: An integer specifying the queue depth after the send
+          capacity: An integer specifying the queue's maximum size
+        Returns:
+          A tuple of the batch size and linger time to use next.
+        """
+        with self._lock:
+            self.latency += self.SMOOTHING * (latency - self.latency)
+            self.error_rate += self.SMOOTHING * ((not ok) - self.error_rate)
+            fill = queued / capacity if capacity > 0 else 0.0
+            if not ok:
+                self.batch_size = self._clamp_batch(self.batch_size // 2)
+                self.linger = self._clamp_linger(max(self.linger * 2, self.latency))
+            elif fill >= self.HIGH_WATER or sent >= self.batch_size:
+                self.batch_size = self._clamp_batch(self.batch_size * 2)
+                self.linger = self._clamp_linger(max(self.linger, self.latency))
+            elif not queued and sent * 2 < self.batch_size:
+                self.batch_size = self._clamp_batch(self.batch_size * 3 // 4)
+                self.linger = self._clamp_linger(self.linger / 2)
+            return self.batch_size, self.linger
+
+    def settings(self) -> dict:
+        """
+        Report the current settings and the observations behind them.
+
+        Args:
+          None
+        Returns:
+          A dict containing the batch size, linger time, smoothed send
+              latency, and smoothed error rate.
+        """
+        with self._lock:
+            return {
+                "batch_size": self.batch_size,
+                "linger": self.linger,
+                "latency": self.latency,
+                "error_rate": self.error_rate,
+                "batch_bounds": (self.min_batch, self.max_batch),
+                "linger_bounds": (self.min_linger, self.max_linger),
+            }
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+A compact binary capture format for serialized GELF messages.
+
+A capture file starts with the 8-byte magic `GELFCAP1`, followed by one
+entry per message: a little-endian float64 epoch timestamp, a uint32
+length, and the message bytes exactly as they were written to the wire,
+without transport framing.
+"""
+
+import struct
+import threading
+import time
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+MAGIC = b"GELFCAP1"
+_ENTRY = struct.Struct("<dI")
+
+
+class CaptureWriter:
+    """
+    Appends serialized GELF messages, with their timestamps, to a capture
+    file. Safe to share between threads.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open a capture file for writing, replacing any existing file.
+
+        Args:
+          path: A string specifying where to write the capture
+        Returns:
+          An instantiated CaptureWriter object.
+        """
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._fh: Optional[BinaryIO] = open(path, "wb")
+        self._fh.write(MAGIC)
+
+    def write(self, frame: bytes, timestamp: Optional[float] = None) -> None:
+        """
+        Append one message to the capture.
+
+        Args:
+          frame: The serialized GELF message
+          timestamp: A float specifying when the message was logged
+              (optional, defaults to now)
+        Returns:
+          None
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            if self._fh is None:
+                return
+            self._fh.write(_ENTRY.pack(timestamp, len(frame)))
+            self._fh.write(frame)
+            self.count += 1
+
+    def flush(self) -> None:
+        """"""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def close(self) -> None:
+        """
+        Flush and close the capture file.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, bytes]]:
+    """
+    Reads the messages of a capture file in the order they were written,
+        holding only one message in memory at a time.
+
+    Args:
+      path: A string specifying the capture file to read
+    Returns:
+      An iterator of (timestamp, serialized GELF message) tuples.
+    Raises:
+      ValueError: {path} is not a GELF capture file
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a GELF capture file")
+        while True:
+            header = f.read(_ENTRY.size)
+            if len(header) < _ENTRY.size:
+                return
+            timestamp, length = _ENTRY.unpack(header)
+            frame = f.read(length)
+            if len(frame) < length:
+                return
+            yield timestamp, frame
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import logging
+import socket
+from typing import List, Mapping, Sequence
+
+from graylogging.batching import AdaptiveBatchController
+from graylogging.graylogging import GraylogHandler
+from graylogging.pipeline import ShippingPipeline
+from graylogging.records import CompactRecord
+from graylogging.tools import serialize_gelf, validate_gelf_payload
+
+
+class GraylogFanoutHandler(GraylogHandler):
+    """
+    A handler class which writes each logging record to several Graylog
+    servers at once.
+
+    Every record is formatted, validated, and serialized a single time; the
+    resulting bytes are queued to one ShippingPipeline per destination. Each
+    destination has its own transport, queue, and worker thread, so a slow or
+    failing destination only drops its own copies of the records.
+    """
+
+    def __init__(
+        self,
+        destinations: Sequence[Mapping],
+        facility: int = GraylogHandler.LOG_USER,
+        hostname: str = socket.gethostname(),
+        appname: str = None,
+        queue_size: int = 10000,
+        trusted: bool = False,
+    ) -> None:
+        """
+        Initialize a handler.
+
+        Args:
+          destinations: A sequence of dicts, each containing the `host`,
+              `port`, and `transport` of a Graylog target and optionally
+              `verify` and `queue_size`
+          facility: An integer specifying the log facility to use (optional,
+              defaults to the value of LOG_USER: 1)
+          appname: A string specifying the name of the application that is
+              logging if different from `source` (optional)
+          queue_size: An integer specifying the default number of records
+              buffered per destination (optional, defaults to 10000)
+          trusted: A boolean specifying whether to skip validating the
+              payloads this handler builds from log records (optional,
+              defaults to False)
+        Returns:
+          An instantiated GraylogFanoutHandler object.
+        Raises:
+          ValueError: At least one destination is required
+        """
+        if not destinations:
+            raise ValueError("At least one destination is required")
+        super(GraylogFanoutHandler, self).__init__(
+            None,
+            transport=None,
+            facility=facility,
+            hostname=hostname,
+            appname=appname,
+            trusted=trusted,
+        )
+        self.pipelines: List[ShippingPipeline] = []
+        for dest in destinations:
+            transport = dest.get("transport", "tcp")
+            graylog = self._new_transport(
+                transport,
+                dest["host"],
+                dest.get("port"),
+                dest.get("verify", True),
+            )
+            self.pipelines.append(
+                ShippingPipeline(
+                    graylog,
+                    queue_size=dest.get("queue_size", queue_size),
+                    name=f"graylogging-{transport}-{dest['host']}:{dest.get('port')}",
+                    controller=AdaptiveBatchController(),
+                )
+            )
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Serialize a record once and queue it to every destination.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          None
+        """
+        try:
+            frame = self._encode_entry(CompactRecord(record))
+            for pipeline in self.pipelines:
+                pipeline.submit(frame)
+        except Exception:
+            self.handleError(record)
+
+    def send(self, payload: dict, trusted: bool = False) -> None:
+        """
+        Serialize a GELF payload once and queue it to every destination.
+
+        Args:
+          payload: A dict containing the GELF payload
+          trusted: A boolean specifying whether to skip validating the payload
+              (optional, defaults to False)
+        Returns:
+          None
+        """
+        if not trusted:
+            validate_gelf_payload(payload)
+        frame = serialize_gelf(payload)
+        for pipeline in self.pipelines:
+            pipeline.submit(frame)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Wait for every destination to ship what it has queued.
+
+        Args:
+          timeout: A float specifying the most seconds to wait per destination
+              (optional, defaults to 5)
+        Returns:
+          None
+        """
+        for pipeline in self.pipelines:
+            pipeline.flush(timeout)
+
+    def close(self) -> None:
+        """
+        Ship queued records and stop every destination's worker.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        for pipeline in self.pipelines:
+            pipeline.close()
+        super(GraylogFanoutHandler, self).close()
+
+    def stats(self) -> List[dict]:
+        """
+        Report the counters of every destination.
+
+        Args:
+          None
+        Returns:
+          A list of dicts, one per destination in configuration order.
+        """
+        return [pipeline.stats() for pipeline in self.pipelines]
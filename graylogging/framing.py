@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import itertools
+import os
+import struct
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from graylogging.tools import serialize_gelf
+
+FRAMINGS = ("tcp", "udp", "http")
+CHUNK_MAGIC = b"\x1e\x0f"
+CHUNK_HEADER_SIZE = 12
+MAX_CHUNKS = 128
+_DELIMITERS = {"tcp": b"\0", "http": b"\n"}
+
+Frame = Union[dict, bytes, bytearray, memoryview]
+
+
+class FrameBuffer:
+    """
+    Lays out a batch of GELF messages, framed for a transport, in one
+    contiguous buffer that is reused from batch to batch once the previous
+    batch's segments have been released.
+
+    TCP messages are null-delimited and HTTP messages newline-delimited, each
+    as a single segment. UDP messages become one segment per datagram;
+    messages larger than the chunk size are split into GELF chunks, whose
+    headers are written in place so each datagram can be sent as is.
+    Segments are views onto the buffer itself, not copies. A bytearray cannot
+    be resized while views of it exist, so if any segment of the previous
+    batch is still alive the next batch starts a new buffer instead, and
+    segments never change under their holder.
+    """
+
+    def __init__(self, chunk_size: int = 8192) -> None:
+        """
+        Initialize an empty buffer.
+
+        Args:
+          chunk_size: An integer specifying the largest UDP datagram, chunk
+              header included (optional, defaults to 8192)
+        Returns:
+          An instantiated FrameBuffer object.
+        Raises:
+          ValueError: The chunk size leaves no room for data
+        """
+        if chunk_size <= CHUNK_HEADER_SIZE:
+            raise ValueError(f"{chunk_size} is too small a chunk size")
+        self.chunk_size = chunk_size
+        self.oversized = 0
+        self._buffer = bytearray()
+        self._ids = itertools.count(int.from_bytes(os.urandom(8), "big"))
+
+    def _message_id(self) -> bytes:
+        """"""
+        return struct.pack(">Q", next(self._ids) & 0xFFFFFFFFFFFFFFFF)
+
+    def _append_datagrams(self, frame: Frame, bounds: List[Tuple[int, int]]) -> None:
+        """"""
+        buf = self._buffer
+        start = len(buf)
+        if len(frame) <= self.chunk_size:
+            buf += frame
+            bounds.append((start, len(buf)))
+            return
+        body = self.chunk_size - CHUNK_HEADER_SIZE
+        count = -(-len(frame) // body)
+        if count > MAX_CHUNKS:
+            self.oversized += 1
+            return
+        message_id = self._message_id()
+        view = memoryview(frame)
+        for seq in range(count):
+            start = len(buf)
+            buf += CHUNK_MAGIC
+            buf += message_id
+            buf.append(seq)
+            buf.append(count)
+            buf += view[seq * body : (seq + 1) * body]
+            bounds.append((start, len(buf)))
+
+    def frame(
+        self, messages: Iterable[Frame], framing: str = "tcp"
+    ) -> List[memoryview]:
+        """
+        Frames a batch of messages for a transport.
+
+        Args:
+          messages: An iterable of GELF payload dicts or serialized messages
+              (already compressed, for UDP)
+          framing: A string specifying the transport: tcp, udp, or http
+              (optional, defaults to tcp)
+        Returns:
+          A list of memoryviews: the whole batch for TCP and HTTP, or one per
+              datagram for UDP. Empty if there were no messages. UDP messages
+              that would need more than 128 chunks are skipped and counted in
+              `oversized`.
+        Raises:
+          ValueError: {framing} is not a valid framing
+        """
+        if framing not in FRAMINGS:
+            raise ValueError(
+                f"{framing} is not a valid framing. Please choose one of {FRAMINGS}"
+            )
+        buf = self._buffer
+        try:
+            del buf[:]
+        except BufferError:
+            # The caller still holds segments of the last batch; leave them be.
+            buf = self._buffer = bytearray()
+        bounds: List[Tuple[int, int]] = []
+        delimiter = _DELIMITERS.get(framing)
+        for message in messages:
+            if isinstance(message, dict):
+                message = serialize_gelf(message)
+            if delimiter is None:
+                self._append_datagrams(message, bounds)
+            else:
+                buf += message
+                buf += delimiter
+        if delimiter is not None and buf:
+            bounds.append((0, len(buf)))
+        data = memoryview(buf)
+        return [data[start:end] for start, end in bounds]
+
+    def frame_stream(
+        self, messages: Iterable[Frame], framing: str = "tcp", batch_size: int = 500
+    ) -> Iterator[List[memoryview]]:
+        """
+        Frames a stream of messages in batches, so an unbounded iterator can be
+            shipped without holding it all in memory.
+
+        Args:
+          messages: An iterable of GELF payload dicts or serialized messages
+          framing: A string specifying the transport: tcp, udp, or http
+              (optional, defaults to tcp)
+          batch_size: An integer specifying how many messages go in each batch
+              (optional, defaults to 500)
+        Returns:
+          An iterator of framed batches, as returned by `frame`.
+        """
+        messages = iter(messages)
+        while True:
+            batch = list(itertools.islice(messages, batch_size))
+            if not batch:
+                return
+            yield self.frame(batch, framing)
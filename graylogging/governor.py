@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+
+class LoadGovernor:
+    """
+    Sheds low-severity records when shipping falls behind, one level at a
+    time, and restores them once the pressure has stayed low for a while.
+
+    Pressure is the largest of the queue fill ratio, the smoothed send
+    latency relative to `latency_limit`, and the smoothed error rate
+    relative to `error_limit`. At `high` pressure the minimum level shipped
+    is raised one step, e.g. from DEBUG to INFO, at most once per `raise_after`
+    seconds. It is lowered one step only after pressure has stayed at or
+    below `low` for `hold` seconds, so the level does not flap.
+    """
+
+    STEPS = (logging.DEBUG, logging.INFO, logging.WARNING)
+
+    def __init__(
+        self,
+        levels: Sequence[int] = STEPS,
+        high: float = 0.5,
+        low: float = 0.2,
+        latency_limit: float = 1.0,
+        error_limit: float = 0.5,
+        raise_after: float = 1.0,
+        hold: float = 10.0,
+        interval: float = 0.25,
+    ) -> None:
+        """
+        Initialize a governor that ships every level.
+
+        Args:
+          levels: A sequence of the minimum levels to step through, lowest
+              first (optional, defaults to DEBUG, INFO, and WARNING)
+          high: A float specifying the pressure at which to shed another
+              level (optional, defaults to 0.5)
+          low: A float specifying the pressure at or below which shed levels
+              may be restored (optional, defaults to 0.2)
+          latency_limit: A float specifying the send latency, in seconds,
+              that counts as full pressure (optional, defaults to 1)
+          error_limit: A float specifying the error rate that counts as full
+              pressure (optional, defaults to 0.5)
+          raise_after: A float specifying the fewest seconds between two
+              steps up (optional, defaults to 1)
+          hold: A float specifying how many seconds pressure must stay low
+              before each step down (optional, defaults to 10)
+          interval: A float specifying the fewest seconds between two checks
+              (optional, defaults to 0.25)
+        Returns:
+          An instantiated LoadGovernor object.
+        Raises:
+          ValueError: The thresholds are out of order
+        """
+        if not 0 <= low < high:
+            raise ValueError(f"{low} and {high} are not valid pressure thresholds")
+        self.levels = tuple(levels)
+        self.high = high
+        self.low = low
+        self.latency_limit = latency_limit
+        self.error_limit = error_limit
+        self.raise_after = raise_after
+        self.hold = hold
+        self.interval = interval
+        self.step = 0
+        self.min_level = self.levels[0]
+        self.pressure = 0.0
+        self.shed = 0
+        self.transitions = 0
+        self.next_check = 0.0
+        self._changed = float("-inf")
+        self._calm_since: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def measure(
+        self, queued: int, capacity: int, latency: float, error_rate: float
+    ) -> float:
+        """
+        Combines the pipeline's observations into one pressure figure.
+
+        Args:
+          queued: An integer specifying the queue depth
+          capacity: An integer specifying the queue's maximum size
+          latency: A float specifying the smoothed send latency in seconds
+          error_rate: A float specifying the smoothed send error rate
+        Returns:
+          A float where 0 is idle and 1 is at a limit.
+        """
+        return max(
+            queued / capacity if capacity > 0 else 0.0,
+            latency / self.latency_limit if self.latency_limit > 0 else 0.0,
+            error_rate / self.error_limit if self.error_limit > 0 else 0.0,
+        )
+
+    def update(
+        self,
+        queued: int,
+        capacity: int,
+        latency: float,
+        error_rate: float,
+        now: Optional[float] = None,
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Check the pressure and step the minimum level if it calls for it.
+            Returns at once if another thread is already checking.
+
+        Args:
+          queued: An integer specifying the queue depth
+          capacity: An integer specifying the queue's maximum size
+          latency: A float specifying the smoothed send latency in seconds
+          error_rate: A float specifying the smoothed send error rate
+          now: A float specifying the current monotonic time (optional)
+        Returns:
+          A tuple of the previous and new minimum levels if the level
+              changed, otherwise None.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if now is None:
+                now = time.monotonic()
+            self.next_check = now + self.interval
+            self.pressure = self.measure(queued, capacity, latency, error_rate)
+            if self.pressure > self.low:
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+            step = self.step
+            if self.pressure >= self.high:
+                if (
+                    step < len(self.levels) - 1
+                    and now - self._changed >= self.raise_after
+                ):
+                    step += 1
+            elif step and self._calm_since is not None:
+                if now - max(self._calm_since, self._changed) >= self.hold:
+                    step -= 1
+            if step == self.step:
+                return None
+            previous = self.min_level
+            self.step = step
+            self.min_level = self.levels[step]
+            self._changed = now
+            self.transitions += 1
+            return previous, self.min_level
+        finally:
+            self._lock.release()
+
+    def stats(self) -> dict:
+        """
+        Report the governor's state.
+
+        Args:
+          None
+        Returns:
+          A dict containing the minimum level shipped, the last pressure
+              measured, and the shed record and transition counts.
+        """
+        return {
+            "min_level": logging.getLevelName(self.min_level),
+            "pressure": self.pressure,
+            "shed": self.shed,
+            "transitions": self.transitions,
+        }
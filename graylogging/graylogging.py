@@ -3,19 +3,71 @@
 import logging
 import socket
 import time
-from typing import Optional, Union
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
+from graylogging.batching import AdaptiveBatchController
+from graylogging.capture import CaptureWriter
+from graylogging.framing import FrameBuffer
+from graylogging.governor import LoadGovernor
 from graylogging.http_client import HTTPGELF
+from graylogging.offload import ProcessOffload
+from graylogging.pipeline import ShippingPipeline
+from graylogging.records import CallSiteCache, CompactRecord, location_fields
+from graylogging.registry import encode_bound, shared_pipelines
+from graylogging.retry import MessageIds, RetryPolicy
+from graylogging.shards import ShardedBuffer
 from graylogging.tcp_client import TCPGELF
+from graylogging.tools import serialize_gelf, validate_gelf_payload
 from graylogging.udp_client import UDPGELF
+from graylogging.volume import CallSiteVolume
 
 
 class GraylogFormatter(logging.Formatter):
     """"""
 
-    def __init__(self):
+    def __init__(self, chunk_size: int = 8192):
 
         super(GraylogFormatter, self).__init__()
+        self._frames = FrameBuffer(chunk_size)
+
+    def format_batch(
+        self, messages: Iterable[Union[dict, bytes]], framing: str = "tcp"
+    ) -> List[memoryview]:
+        """
+        Serializes and frames a batch of GELF messages into one contiguous
+        buffer, reused from call to call: null-delimited for TCP,
+        newline-delimited for HTTP, and one datagram per segment, chunked
+        where needed, for UDP. Not safe to call from several threads at once.
+
+        Args:
+          messages: An iterable of GELF payload dicts or serialized messages
+          framing: A string specifying the transport: tcp, udp, or http
+              (optional, defaults to tcp)
+        Returns:
+          A list of memoryviews of the buffer, not copies, ready to write:
+              the whole batch for TCP and HTTP, or one per datagram for UDP.
+        """
+        return self._frames.frame(messages, framing)
+
+    def format_stream(
+        self,
+        messages: Iterable[Union[dict, bytes]],
+        framing: str = "tcp",
+        batch_size: int = 500,
+    ) -> Iterator[List[memoryview]]:
+        """
+        Frames an iterator of GELF messages batch by batch, as format_batch.
+
+        Args:
+          messages: An iterable of GELF payload dicts or serialized messages
+          framing: A string specifying the transport: tcp, udp, or http
+              (optional, defaults to tcp)
+          batch_size: An integer specifying how many messages go in each batch
+              (optional, defaults to 500)
+        Returns:
+          An iterator of framed batches.
+        """
+        return self._frames.frame_stream(messages, framing, batch_size)
 
     @classmethod
     def format_record(
@@ -195,6 +247,22 @@ class GraylogHandler(logging.Handler):
         appname: str = None,
         verify: bool = True,
         close_on_error: bool = False,
+        buffered: bool = False,
+        queue_size: int = 10000,
+        batch_bounds: Tuple[int, int] = (1, 500),
+        linger_bounds: Tuple[float, float] = (0.0, 0.5),
+        trusted: bool = False,
+        compress: Optional[str] = None,
+        offload: bool = False,
+        prewarm: bool = False,
+        callsite_cache_size: int = 1024,
+        record_to: Optional[str] = None,
+        volume_top_k: int = 100,
+        sharded: bool = False,
+        sequence: bool = False,
+        shed_load: bool = False,
+        shared: bool = False,
+        retry: bool = False,
     ) -> None:
         """
         Initialize a handler.
@@ -208,9 +276,70 @@ class GraylogHandler(logging.Handler):
               logging if different from `source` (optional)
           verify: A boolean specifying whether to verify the server's TLS cert
               (optional, defaults to True)
+          buffered: A boolean specifying whether to queue records and ship
+              them in batches from a background thread (optional, defaults to
+              False)
+          queue_size: An integer specifying the most records to buffer before
+              dropping new ones (optional, defaults to 10000)
+          batch_bounds: A tuple of the smallest and largest batch sizes the
+              buffered pipeline may choose (optional, defaults to 1 and 500)
+          linger_bounds: A tuple of the shortest and longest times, in seconds,
+              the buffered pipeline may wait for a batch to fill (optional,
+              defaults to 0 and 0.5)
+          trusted: A boolean specifying whether to skip validating the
+              payloads this handler builds from log records (optional,
+              defaults to False)
+          compress: A string specifying how to compress messages, gzip or
+              zlib (optional, UDP and HTTP only)
+          offload: A boolean specifying whether to build, serialize, and ship
+              payloads from a dedicated subprocess instead of a thread; implies
+              `buffered` (optional, defaults to False)
+          prewarm: A boolean specifying whether to resolve the host and open
+              the connection now rather than on the first record (optional,
+              defaults to False)
+          callsite_cache_size: An integer specifying how many call sites to
+              keep pre-encoded location fields for (optional, defaults to
+              1024)
+          record_to: A string specifying a file to record every serialized
+              GELF message to, with its timestamp, for later replay (optional)
+          volume_top_k: An integer specifying how many of the noisiest call
+              sites to track the record and byte volume of, or 0 to disable
+              (optional, defaults to 100; not available with `offload`)
+          sharded: A boolean specifying whether logging threads append records
+              to per-thread buffers without taking the handler's lock, for
+              heavily multithreaded applications; implies `buffered`
+              (optional, defaults to False)
+          sequence: A boolean specifying whether to stamp each message with
+              this sender's id and a sequence number, as `_seq_sender` and
+              `_seq`, to measure delivery loss (optional, UDP only, defaults
+              to False)
+          shed_load: A boolean specifying whether to raise the minimum level
+              shipped, one step at a time from DEBUG to WARNING, while the
+              pipeline is falling behind, and restore it once it catches up;
+              implies `buffered` (optional, defaults to False)
+          shared: A boolean specifying whether to share one connection and
+              pipeline with every other shared handler for the same
+              endpoint, closed when the last of them closes; the first
+              handler's queue and batch settings apply; implies `buffered`
+              (optional, defaults to False)
+          retry: A boolean specifying whether to send failed batches again
+              after a jittered backoff, within a budget of 10% of first
+              attempts, stamping each message with a `_message_id` so
+              duplicates can be dropped downstream; implies `buffered`
+              (optional, defaults to False)
         Returns:
           An instantiated GraylogHandler object.
+        Raises:
+          ValueError: Sequence numbers are only supported over UDP
+          ValueError: Shared pipelines are not available with offload
+          ValueError: Retries are not available with offload
         """
+        if sequence and str(transport).lower() != "udp":
+            raise ValueError("Sequence numbers are only supported over UDP")
+        if shared and offload:
+            raise ValueError("Shared pipelines are not available with offload")
+        if retry and offload:
+            raise ValueError("Retries are not available with offload")
 
         logging.Handler.__init__(self)
         self.host = host
@@ -220,8 +349,116 @@ class GraylogHandler(logging.Handler):
         self.closeOnError = close_on_error
         self.hostname = hostname
         self.verify = verify
-        if appname:
-            self.appname = appname
+        self.appname = appname
+        self.trusted = trusted
+        self.compress = compress
+        self.sequence = sequence
+        self.queue_size = queue_size
+        self._graylog = None
+        self.message_ids = MessageIds() if retry else None
+        self.callsites = CallSiteCache(callsite_cache_size)
+        self.recorder = None
+        if record_to and not offload:
+            self.recorder = CaptureWriter(record_to)
+        self.volume = None
+        if volume_top_k and not offload:
+            self.volume = CallSiteVolume(volume_top_k)
+        self.pipeline = None
+        self._shared_key = None
+        self._released = False
+        if offload:
+            self.pipeline = ProcessOffload(
+                {
+                    "host": host,
+                    "port": port,
+                    "transport": transport,
+                    "facility": facility,
+                    "hostname": hostname,
+                    "appname": appname,
+                    "verify": verify,
+                    "trusted": trusted,
+                    "compress": compress,
+                    "prewarm": prewarm,
+                    "callsite_cache_size": callsite_cache_size,
+                    "record_to": record_to,
+                    "volume_top_k": 0,
+                    "sequence": sequence,
+                },
+                queue_size=queue_size,
+                batch_bounds=batch_bounds,
+                linger_bounds=linger_bounds,
+            )
+        elif shared:
+            self._shared_key = (
+                str(transport).lower(),
+                host,
+                port,
+                verify,
+                compress,
+                sequence,
+                retry,
+            )
+            self.pipeline = shared_pipelines.acquire(
+                self._shared_key,
+                lambda: ShippingPipeline(
+                    self._connect_graylog(),
+                    encoder=encode_bound,
+                    queue_size=queue_size,
+                    name=f"graylogging-shared-{transport}-{host}:{port}",
+                    controller=AdaptiveBatchController(batch_bounds, linger_bounds),
+                    retry=RetryPolicy() if retry else None,
+                ),
+            )
+        elif buffered or sharded or shed_load or retry:
+            self.pipeline = ShippingPipeline(
+                self._connect_graylog(),
+                encoder=self._encode_entry,
+                queue_size=queue_size,
+                name=f"graylogging-{transport}-{host}:{port}",
+                controller=AdaptiveBatchController(batch_bounds, linger_bounds),
+                retry=RetryPolicy() if retry else None,
+            )
+        self.governor = LoadGovernor() if shed_load else None
+        self.shards = None
+        if sharded:
+            self.shards = ShardedBuffer(
+                self._enqueue_many, name=f"graylogging-shards-{host}:{port}"
+            )
+        if prewarm and not offload:
+            self._prewarm()
+
+    def _transport(self) -> Union[TCPGELF, UDPGELF, HTTPGELF]:
+        """
+        Returns the Graylog object records are shipped through, creating it
+            on first use so its connection is reused across records.
+
+        Args:
+          None
+        Returns:
+          An instantiated Graylog object.
+        """
+        if self.pipeline is not None:
+            return self.pipeline.transport
+        if self._graylog is None:
+            self._graylog = self._connect_graylog()
+        return self._graylog
+
+    def _prewarm(self) -> None:
+        """
+        Resolves the host and opens the connection ahead of the first record.
+            Failures are logged and left for the first record to retry.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        try:
+            self._transport().connect()
+        except Exception as exc:
+            logging.getLogger(__name__).warning(
+                "Failed to pre-warm the connection to %s: %s", self.host, exc
+            )
 
     def _connect_graylog(self) -> Union[TCPGELF, UDPGELF, HTTPGELF]:
         """
@@ -234,14 +471,56 @@ class GraylogHandler(logging.Handler):
         Raises:
           ValueError: {self.transport} is not a valid transport type
         """
-        if self.transport.lower() == "tcp":
-            graylog = TCPGELF(self.host, self.port)
-        elif self.transport.lower() == "udp":
-            graylog = UDPGELF(self.host, self.port)
-        elif self.transport.lower() == "http":
-            graylog = HTTPGELF(self.host, self.port, timeout=10, verify=self.verify)
+        return self._new_transport(
+            self.transport,
+            self.host,
+            self.port,
+            self.verify,
+            self.compress,
+            sequence=self.sequence,
+        )
+
+    @staticmethod
+    def _new_transport(
+        transport: str,
+        host: str,
+        port: int,
+        verify: bool = True,
+        compress: Optional[str] = None,
+        sequence: bool = False,
+    ) -> Union[TCPGELF, UDPGELF, HTTPGELF]:
+        """
+        Instantiates a Graylog object for the given transport type.
+
+        Args:
+          transport: A string specifying the transport: tcp, udp, or http
+          host: A string specifying the URL of the Graylog target
+          port: An integer specifying the port number for the Graylog target
+          verify: A boolean specifying whether to verify the server's TLS cert
+              (optional, defaults to True)
+          compress: A string specifying how to compress messages, gzip or
+              zlib (optional, UDP and HTTP only)
+          sequence: A boolean specifying whether to stamp messages with
+              sequence numbers (optional, UDP only)
+        Returns:
+          An instantiated Graylog object.
+        Raises:
+          ValueError: {transport} is not a valid transport type
+          ValueError: GELF over TCP does not support compression
+          ValueError: Sequence numbers are only supported over UDP
+        """
+        if sequence and transport.lower() != "udp":
+            raise ValueError("Sequence numbers are only supported over UDP")
+        if transport.lower() == "tcp":
+            if compress:
+                raise ValueError("GELF over TCP does not support compression")
+            graylog = TCPGELF(host, port)
+        elif transport.lower() == "udp":
+            graylog = UDPGELF(host, port, compress=compress, sequence=sequence)
+        elif transport.lower() == "http":
+            graylog = HTTPGELF(host, port, timeout=10, verify=verify, compress=compress)
         else:
-            raise ValueError(f"{self.transport} is not a valid transport type")
+            raise ValueError(f"{transport} is not a valid transport type")
         return graylog
 
     @classmethod
@@ -307,17 +586,93 @@ class GraylogHandler(logging.Handler):
                 )
         return extra_args
 
-    def send(self, payload: str) -> Optional[dict]:
+    def send(self, payload: str, trusted: bool = False) -> Optional[dict]:
         """
-        Send a JSON object to the GELF endpoint.
+        Send a JSON object to the GELF endpoint. In buffered mode the payload
+        is queued for the background pipeline instead. Either way it is
+        recorded if the handler is recording.
 
         Args:
           payload: A JSON-formatted GELF payload
+          trusted: A boolean specifying whether to skip validating the payload
+              (optional, defaults to False)
         Returns:
-          The result of the POST to the GELF endpoint.
+          The result of the POST to the GELF endpoint, or None when buffered.
         """
-        graylog = self._connect_graylog()
-        return graylog.send_gelf(payload)
+        if self.pipeline is None:
+            if self.recorder is not None:
+                if not trusted:
+                    validate_gelf_payload(payload)
+                    trusted = True
+                self.recorder.write(serialize_gelf(payload))
+            return self._transport().send_gelf(payload, trusted=trusted)
+        if not trusted:
+            validate_gelf_payload(payload)
+        if self.message_ids is not None:
+            payload = {**payload, "_message_id": self.message_ids.next()}
+        frame = serialize_gelf(payload)
+        if self.recorder is not None:
+            self.recorder.write(frame)
+        self.pipeline.submit(frame)
+        return None
+
+    def batch_settings(self) -> Optional[dict]:
+        """
+        Report the batch size and linger time the buffered pipeline is using,
+            along with the observations they were derived from.
+
+        Args:
+          None
+        Returns:
+          A dict of the current batch settings, or None when not buffered.
+        """
+        if self.pipeline is None:
+            return None
+        settings = {**self.pipeline.controller.settings(), **self.pipeline.stats()}
+        if self.shards is not None:
+            settings["dropped"] += self.shards.stats()["dropped"]
+        if self.governor is not None:
+            settings.update(self.governor.stats())
+        return settings
+
+    def flush(self) -> None:
+        """
+        Wait for the buffered pipeline, if any, to ship what it has queued.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        if self.shards is not None:
+            self.shards.flush()
+        if self.pipeline is not None:
+            self.pipeline.flush(timeout=5.0)
+
+    def close(self) -> None:
+        """
+        Ship any buffered records and release the pipeline.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        if self.shards is not None:
+            self.shards.close()
+        if self._shared_key is not None:
+            if not self._released:
+                self._released = True
+                self.pipeline.flush(timeout=5.0)
+                shared_pipelines.release(self._shared_key)
+        elif self.pipeline is not None:
+            self.pipeline.close()
+        if self._graylog is not None:
+            self._graylog.close()
+            self._graylog = None
+        if self.recorder is not None:
+            self.recorder.close()
+        logging.Handler.close(self)
 
     def handleError(self, record) -> None:
         """
@@ -331,9 +686,9 @@ class GraylogHandler(logging.Handler):
         Returns:
           None
         """
-        if self.closeOnError and self.sess:
-            self.sess.close()
-            self.sess = None  # try to reconnect next time
+        if self.closeOnError and self._graylog:
+            self._graylog.close()
+            self._graylog = None  # try to reconnect next time
         else:
             logging.Handler.handleError(self, record)
 
@@ -415,10 +770,179 @@ class GraylogHandler(logging.Handler):
         """
         return self.priority_map.get(levelName, 4)
 
+    def _build_payload(self, entry: CompactRecord, location: bool = True) -> dict:
+        """
+        Formats a captured record as a GELF payload.
+
+        Args:
+          entry: A CompactRecord object
+          location: A boolean specifying whether to include the call site
+              fields (optional, defaults to True)
+        Returns:
+          A GELF-formatted dictionary.
+        """
+        msg_payload = GraylogFormatter.format_record(
+            entry.msg,
+            host=self.hostname,
+            full_message=entry.stack_info,
+            timestamp=entry.created,
+            level=entry.levelname,
+            _appname=self.appname,
+            _exc_info=entry.exc_info,
+            _exc_text=entry.exc_text,
+            _process=entry.processName,
+            _thread=entry.threadName,
+        )
+        msg_payload["_priority"] = self.encodePriority(
+            self.facility, self.mapPriority(entry.levelname)
+        )
+        if entry.render_error is not None:
+            msg_payload["_render_error"] = entry.render_error
+        if location:
+            msg_payload.update(location_fields(entry))
+        return msg_payload
+
+    def _encode_entry(self, entry: CompactRecord) -> bytes:
+        """
+        Formats, validates, and serializes a captured record, then records
+            and accounts for the result. The call site fields come
+            pre-encoded from the call site cache and are spliced in last.
+
+        Args:
+          entry: A CompactRecord object
+        Returns:
+          The serialized GELF payload.
+        """
+        payload = self._build_payload(entry, location=False)
+        if not self.trusted:
+            validate_gelf_payload(payload)
+        if self.message_ids is not None:
+            payload["_message_id"] = self.message_ids.next()
+        frame = (
+            serialize_gelf(payload)[:-1] + b", " + self.callsites.fragment(entry) + b"}"
+        )
+        if self.recorder is not None:
+            self.recorder.write(frame, entry.created)
+        if self.volume is not None:
+            self.volume.add(entry, len(frame))
+        return frame
+
+    def handle(self, record: logging.LogRecord):
+        """
+        Conditionally emit a record, depending on the handler's filters.
+        In sharded mode the record is captured and appended to the calling
+        thread's buffer without taking the handler's lock; otherwise this is
+        logging.Handler.handle.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          The result of filtering the record: falsy if it was dropped.
+        """
+        if self.governor is not None and not self._admit(record):
+            return False
+        if self.shards is None:
+            return logging.Handler.handle(self, record)
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            try:
+                self.shards.append(CompactRecord(record))
+            except Exception:
+                self.handleError(record)
+        return rv
+
+    def _admit(self, record: logging.LogRecord) -> bool:
+        """
+        Checks a record against the load-shedding governor's minimum level,
+            letting the governor re-evaluate the pipeline's pressure when due.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          A boolean specifying whether the record should be shipped.
+        """
+        governor = self.governor
+        now = time.monotonic()
+        if now >= governor.next_check:
+            stats = self.pipeline.stats()
+            settings = self.pipeline.controller.settings()
+            change = governor.update(
+                stats["queued"],
+                self.queue_size,
+                settings["latency"],
+                settings["error_rate"],
+                now,
+            )
+            if change is not None:
+                self._announce_shedding(*change)
+        if record.levelno < governor.min_level:
+            governor.shed += 1
+            return False
+        return True
+
+    def _announce_shedding(self, previous: int, current: int) -> None:
+        """
+        Ships a GELF event recording a change of the minimum level shipped.
+
+        Args:
+          previous: An integer specifying the previous minimum level
+          current: An integer specifying the new minimum level
+        Returns:
+          None
+        """
+        raised = current > previous
+        previous_name = logging.getLevelName(previous)
+        current_name = logging.getLevelName(current)
+        self.send(
+            GraylogFormatter.format_record(
+                f"Graylog shipping is {'falling behind' if raised else 'recovering'}:"
+                f" minimum level {'raised' if raised else 'lowered'} from"
+                f" {previous_name} to {current_name}",
+                host=self.hostname,
+                level="WARNING" if raised else "NOTICE",
+                _appname=self.appname,
+                _shed_previous_level=previous_name,
+                _shed_min_level=current_name,
+                _shed_pressure=round(self.governor.pressure, 3),
+            ),
+            trusted=True,
+        )
+
+    def _enqueue(self, entry: CompactRecord) -> bool:
+        """
+        Queues a record for the pipeline's worker to encode and ship.
+
+        Args:
+          entry: A CompactRecord object
+        Returns:
+          A boolean specifying whether the record was queued.
+        """
+        if self._shared_key is not None:
+            return self.pipeline.submit((self._encode_entry, entry))
+        return self.pipeline.submit(entry)
+
+    def _enqueue_many(self, entries: List[CompactRecord]) -> int:
+        """
+        Queues records for the pipeline's worker in one queue operation.
+
+        Args:
+          entries: A list of CompactRecord objects
+        Returns:
+          An integer specifying how many records were queued.
+        """
+        if self._shared_key is not None:
+            encode = self._encode_entry
+            entries = [(encode, entry) for entry in entries]
+        return self.pipeline.submit_many(entries)
+
     def emit(self, record: logging.LogRecord) -> None:
         """
         Emit a record.
-        Formats the record for GELF and writes it to the server.
+        Formats the record for GELF and writes it to the server. In buffered
+        mode only a CompactRecord is captured here; formatting and shipping
+        happen on the pipeline's worker thread.
 
         Args:
           record: A LogRecord object
@@ -426,27 +950,10 @@ class GraylogHandler(logging.Handler):
           None
         """
         try:
-            msg_payload = GraylogFormatter.format_record(
-                record.msg,
-                host=self.hostname,
-                full_message=record.stack_info,
-                level=record.levelname,
-                _appname=self.appname,
-                _exc_info=record.exc_info,
-                _exc_text=record.exc_text,
-                _file=record.filename,
-                _line=record.lineno,
-                _module=record.module,
-                _name=record.name,
-                _path=record.pathname,
-                _process=record.processName,
-                _thread=record.threadName,
-            )
-            msg_payload["_priority"] = self.encodePriority(
-                self.facility, self.mapPriority(record.levelname)
-            )
-            if record.funcName != "<module>":
-                msg_payload["_function"] = record.funcName
-            self.send(msg_payload)
+            entry = CompactRecord(record)
+            if self.pipeline is not None:
+                self._enqueue(entry)
+            else:
+                self._transport().send_frames([self._encode_entry(entry)])
         except Exception:
             self.handleError(record)
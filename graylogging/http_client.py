@@ -2,9 +2,9 @@
 # -*- encoding: utf-8 -*-
 
 import requests
-from typing import Optional
+from typing import Optional, Sequence
 
-from graylogging.tools import validate_gelf_payload
+from graylogging.tools import compress_gelf, validate_gelf_payload
 
 
 class HTTPGELF:
@@ -17,6 +17,7 @@ class HTTPGELF:
         protocol: str = "https",
         timeout: int = 30,
         verify: bool = True,
+        compress: Optional[str] = None,
     ) -> None:
         self.proto = protocol
         self.host = host
@@ -27,9 +28,35 @@ class HTTPGELF:
         }
         self.timeout = timeout
         self.verify = verify
+        self.compress = compress
         self.sess = requests.Session()
         self.url = f"{self.proto}://{self.host}:{self.port}/gelf"
 
+    def connect(self) -> None:
+        """
+        Opens a pooled connection to Graylog ahead of the first message. Any
+            HTTP response will do, since only the connection is kept.
+
+        Args:
+          None
+        Returns:
+          None
+        Raises:
+          requests.RequestException: Unable to reach the server
+        """
+        self.sess.head(self.url, timeout=self.timeout, verify=self.verify)
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        self.sess.close()
+
     def _post(self, body: dict) -> dict:
         """
         Sends an HTTP POST request.
@@ -75,29 +102,44 @@ class HTTPGELF:
               begin with an underscore (_).
           KeyError: _id is reserved for internal use.
         """
-        required_keys = ["version", "host", "short_message"]
-        builtin_keys = required_keys + ["full_message", "timestamp", "level"]
-        for rkey in required_keys:
-            if rkey not in body.keys():
-                raise KeyError(f"{rkey} is a required key!")
-        for key in body.keys():
-            if key not in builtin_keys and not key.startswith("_"):
-                raise KeyError(
-                    f"{key} is an invalid key. If using a custom field, it "
-                    "must begin with an underscore (_)."
-                )
-        if "_id" in body.keys():
-            raise KeyError("_id is reserved for internal use.")
-        return True
-
-    def send_gelf(self, body: dict) -> dict:
+        return validate_gelf_payload(body)
+
+    def send_frames(self, frames: Sequence[bytes]) -> None:
+        """
+        Sends already-serialized GELF messages, one POST per message, over the
+            shared session, compressing each if configured to.
+
+        Args:
+          frames: A sequence of JSON-encoded GELF messages
+        Returns:
+          None
+        Raises:
+          requests.HTTPError: The server rejected a message
+        """
+        headers = self.headers
+        if self.compress:
+            encoding = "deflate" if self.compress == "zlib" else self.compress
+            headers = {**self.headers, "Content-Encoding": encoding}
+        for frame in frames:
+            resp = self.sess.post(
+                self.url,
+                data=compress_gelf(frame, self.compress),
+                headers=headers,
+                timeout=self.timeout,
+                verify=self.verify,
+            )
+            resp.raise_for_status()
+
+    def send_gelf(self, body: dict, trusted: bool = False) -> dict:
         """
         Sends a message to Graylog using GELF.
 
         Args:
           body: A dict containing the JSON-formatted GELF payload
+          trusted: A boolean specifying whether to skip validating a payload
+              the caller built itself (optional, defaults to False)
         Returns:
           The results of the POST.
         """
-        if validate_gelf_payload(body):
+        if trusted or validate_gelf_payload(body):
             return self._post(body)
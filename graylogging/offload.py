@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from graylogging.batching import AdaptiveBatchController
+from graylogging.pipeline import ShippingPipeline
+
+
+def _serve(batches: Any, config: dict, processed: Any, sent: Any, failed: Any) -> None:
+    """
+    Runs in the offload process: formats, serializes, compresses, and ships
+    batches of CompactRecords until it receives None. Payloads that were
+    already serialized, e.g. by GraylogHandler.send, are shipped as they are.
+
+    Args:
+      batches: A multiprocessing queue of lists of CompactRecords and
+          serialized GELF messages
+      config: A dict of GraylogHandler keyword arguments
+      processed: A shared counter of batches handled
+      sent: A shared counter of records shipped
+      failed: A shared counter of records that could not be shipped
+    Returns:
+      None
+    """
+    from graylogging.graylogging import GraylogHandler
+
+    handler = GraylogHandler(**config)
+    graylog = handler._transport()
+    while True:
+        batch = batches.get()
+        if batch is None:
+            handler.close()
+            return
+        frames = []
+        for entry in batch:
+            if isinstance(entry, bytes):
+                if handler.recorder is not None:
+                    handler.recorder.write(entry)
+                frames.append(entry)
+                continue
+            try:
+                frames.append(handler._encode_entry(entry))
+            except Exception:
+                with failed.get_lock():
+                    failed.value += 1
+        try:
+            if frames:
+                graylog.send_frames(frames)
+        except Exception:
+            with failed.get_lock():
+                failed.value += len(frames)
+        else:
+            with sent.get_lock():
+                sent.value += len(frames)
+        with processed.get_lock():
+            processed.value += 1
+
+
+class _Handoff:
+    """The feeder pipeline's transport: puts batches on the offload queue."""
+
+    def __init__(self, batches: Any) -> None:
+        self.batches = batches
+        self.handed_off = 0
+        self._lock = threading.Lock()
+
+    def send_frames(self, entries: List[Any]) -> None:
+        """
+        Hands a batch to the offload process. The feeding pipeline passes
+            CompactRecords through unencoded.
+
+        Args:
+          entries: A list of CompactRecord objects or serialized GELF messages
+        Returns:
+          None
+        Raises:
+          queue.Full: The offload process is too far behind
+        """
+        self.batches.put(list(entries), timeout=1.0)
+        with self._lock:
+            self.handed_off += 1
+
+
+class ProcessOffload:
+    """
+    Ships CompactRecords from a dedicated subprocess so that building,
+    serializing, and compressing GELF payloads runs on another core instead
+    of competing for this interpreter's GIL.
+
+    Records are batched in this process by a ShippingPipeline, whose only
+    work is pickling each batch onto a bounded multiprocessing queue. When
+    the subprocess falls behind, that queue fills and the pipeline starts
+    dropping records rather than blocking the application. Its `transport`
+    hands batches straight to the subprocess, bypassing the feeder.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        queue_size: int = 10000,
+        batch_bounds: Tuple[int, int] = (1, 500),
+        linger_bounds: Tuple[float, float] = (0.0, 0.5),
+        max_batches: int = 64,
+    ) -> None:
+        """
+        Start the offload process and the pipeline feeding it.
+
+        Args:
+          config: A dict of picklable GraylogHandler keyword arguments used to
+              build the subprocess's handler
+          queue_size: An integer specifying the most records to buffer in
+              this process (optional, defaults to 10000)
+          batch_bounds: A tuple of the smallest and largest batch sizes
+              (optional, defaults to 1 and 500)
+          linger_bounds: A tuple of the shortest and longest linger times in
+              seconds (optional, defaults to 0 and 0.5)
+          max_batches: An integer specifying how many batches may wait for
+              the subprocess (optional, defaults to 64)
+        Returns:
+          An instantiated ProcessOffload object.
+        """
+        ctx = multiprocessing.get_context("spawn")
+        self._batches = ctx.Queue(maxsize=max_batches)
+        self._handoff = _Handoff(self._batches)
+        self._processed = ctx.Value("q", 0)
+        self._sent = ctx.Value("q", 0)
+        self._failed = ctx.Value("q", 0)
+        self.process = ctx.Process(
+            target=_serve,
+            args=(self._batches, config, self._processed, self._sent, self._failed),
+            name="graylogging-offload",
+            daemon=True,
+        )
+        self.process.start()
+        self.pipeline = ShippingPipeline(
+            self._handoff,
+            queue_size=queue_size,
+            name="graylogging-offload-feeder",
+            controller=AdaptiveBatchController(batch_bounds, linger_bounds),
+        )
+        self.controller = self.pipeline.controller
+        self.transport = self._handoff
+
+    def submit(self, item: Any, block: bool = False, timeout: float = None) -> bool:
+        """
+        Queue a record for the offload process.
+
+        Args:
+          item: A CompactRecord object
+          block: A boolean specifying whether to wait for room in the queue
+              (optional, defaults to False)
+          timeout: A float specifying the most seconds to wait when blocking
+        Returns:
+          A boolean specifying whether the record was queued.
+        """
+        return self.pipeline.submit(item, block, timeout)
+
+    def submit_many(self, items: List[Any]) -> int:
+        """
+        Queue several records for the offload process at once.
+
+        Args:
+          items: A list of CompactRecord objects
+        Returns:
+          An integer specifying how many records were queued.
+        """
+        return self.pipeline.submit_many(items)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the offload process has handled every queued record.
+
+        Args:
+          timeout: A float specifying the most seconds to wait (optional,
+              defaults to waiting indefinitely)
+        Returns:
+          A boolean specifying whether everything was handled in time.
+        """
+        started = time.monotonic()
+        if not self.pipeline.flush(timeout):
+            return False
+        while self._processed.value < self._handoff.handed_off:
+            if not self.process.is_alive():
+                return False
+            if timeout is not None and time.monotonic() - started >= timeout:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Ship what is queued, then stop the feeder and the offload process.
+
+        Args:
+          timeout: A float specifying the most seconds to wait (optional,
+              defaults to 5)
+        Returns:
+          None
+        """
+        self.pipeline.close(timeout)
+        self.flush(timeout)
+        try:
+            self._batches.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._batches.close()
+
+    def stats(self) -> dict:
+        """
+        Report the counters of the feeder and the offload process.
+
+        Args:
+          None
+        Returns:
+          A dict containing the queue depth and the sent, dropped, and failed
+              record counts.
+        """
+        stats = self.pipeline.stats()
+        stats["sent"] = self._sent.value
+        stats["failed"] += self._failed.value
+        return stats
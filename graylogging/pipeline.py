@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+from graylogging.batching import AdaptiveBatchController
+from graylogging.retry import RetryPolicy
+
+
+class _Bulk(list):
+    """Items submitted together, taking one slot per item in a _RecordQueue."""
+
+
+class _RecordQueue(queue.Queue):
+    """
+    A queue whose size, capacity, and unfinished task count are in items, so
+    a _Bulk of items put at once is bounded and finished item by item.
+    """
+
+    def _init(self, maxsize: int) -> None:
+        """"""
+        self.queue: deque = deque()
+        self.items = 0
+
+    def _qsize(self) -> int:
+        """"""
+        return self.items
+
+    def _put(self, item: Any) -> None:
+        """"""
+        self.queue.append(item)
+        if type(item) is _Bulk:
+            self.items += len(item)
+            # put() counts one unfinished task; count the rest of the bulk.
+            self.unfinished_tasks += len(item) - 1
+        else:
+            self.items += 1
+
+    def _get(self) -> Any:
+        """"""
+        item = self.queue.popleft()
+        self.items -= len(item) if type(item) is _Bulk else 1
+        return item
+
+
+class ShippingPipeline:
+    """
+    A bounded queue drained by a background worker that ships batches of
+    serialized GELF messages through a single transport.
+
+    Items are handed to `encoder` on the worker thread to produce the bytes
+    written to the wire; items that are already bytes, or every item when
+    there is no encoder, are shipped as-is. Submitting never blocks: when the
+    queue is full the item is dropped and counted, so a slow or unreachable
+    destination cannot stall the application. When given a controller, the
+    batch size and linger time are retuned after every send instead of
+    staying fixed.
+
+    When given a retry policy, a batch that fails to send is kept aside and
+    sent again after a jittered backoff, while the worker goes on shipping
+    new batches in between. Retried items count as unfinished until they are
+    sent or given up on, but no longer take up room in the queue.
+    """
+
+    def __init__(
+        self,
+        transport: Any,
+        encoder: Optional[Callable[[Any], bytes]] = None,
+        queue_size: int = 10000,
+        batch_size: int = 100,
+        linger: float = 0.05,
+        name: Optional[str] = None,
+        controller: Optional[AdaptiveBatchController] = None,
+        retry: Optional[RetryPolicy] = None,
+    ) -> None:
+        """
+        Initialize a pipeline and start its worker thread.
+
+        Args:
+          transport: A TCPGELF, UDPGELF, or HTTPGELF object to ship through
+          encoder: A callable turning a queued item into a serialized GELF
+              message (optional, defaults to shipping items as-is)
+          queue_size: An integer specifying the maximum number of queued items
+          batch_size: An integer specifying the most items shipped at once
+          linger: A float specifying how many seconds to wait for a batch to
+              fill before shipping it
+          name: A string naming the worker thread (optional)
+          controller: An AdaptiveBatchController overriding `batch_size` and
+              `linger` (optional)
+          retry: A RetryPolicy for batches that fail to send (optional,
+              defaults to giving up on them at once)
+        Returns:
+          An instantiated ShippingPipeline object.
+        """
+        self.transport = transport
+        self.encoder = encoder
+        self.controller = controller
+        self.retry = retry
+        if controller is not None:
+            batch_size, linger = controller.batch_size, controller.linger
+        self.batch_size = batch_size
+        self.linger = linger
+        self.queue = _RecordQueue(maxsize=queue_size)
+        self.logger = logging.getLogger(__name__)
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.errors = 0
+        self.retried = 0
+        self.last_error = None
+        self._retries: List[tuple] = []
+        self._retry_order = itertools.count()
+        self._retrying = 0
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=name or "graylogging-pipeline", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self, item: Any, block: bool = False, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Queue an item for shipping.
+
+        Args:
+          item: The item to ship
+          block: A boolean specifying whether to wait for room in the queue
+              rather than dropping the item (optional, defaults to False)
+          timeout: A float specifying the most seconds to wait when blocking
+              (optional, defaults to waiting indefinitely)
+        Returns:
+          A boolean specifying whether the item was queued.
+        """
+        if self._closed.is_set():
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put(item, block, timeout)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def submit_many(self, items: List[Any]) -> int:
+        """
+        Queue several items for shipping with a single queue operation, e.g.
+            everything a thread buffered since the last drain. Never blocks;
+            the items are dropped together if the queue is full.
+
+        Args:
+          items: A list of items to ship
+        Returns:
+          An integer specifying how many items were queued.
+        """
+        if not items:
+            return 0
+        if self._closed.is_set():
+            self.dropped += len(items)
+            return 0
+        try:
+            self.queue.put_nowait(_Bulk(items))
+        except queue.Full:
+            self.dropped += len(items)
+            return 0
+        return len(items)
+
+    @staticmethod
+    def _take(batch: List[Any], item: Any) -> None:
+        """"""
+        if type(item) is _Bulk:
+            batch.extend(item)
+        else:
+            batch.append(item)
+
+    def _collect(self) -> List[Any]:
+        """
+        Wait for the next item, then gather more until the batch is full or
+            the linger time has passed.
+
+        Args:
+          None
+        Returns:
+          A list of queued items, empty if nothing arrived before shutdown.
+        """
+        batch = []
+        while not batch:
+            timeout = 0.1
+            if self._retries:
+                timeout = min(timeout, max(0.0, self._retries[0][0] - time.monotonic()))
+            try:
+                self._take(batch, self.queue.get(timeout=timeout))
+            except queue.Empty:
+                if self._closed.is_set() or self._retry_due():
+                    return batch
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    self._take(batch, self.queue.get(timeout=remaining))
+                else:
+                    self._take(batch, self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _encode(self, batch: List[Any]) -> List[bytes]:
+        """
+        Serialize the items of a batch, skipping any that fail to encode.
+
+        Args:
+          batch: A list of queued items
+        Returns:
+          A list of serialized GELF messages.
+        """
+        if self.encoder is None:
+            return batch
+        frames = []
+        for item in batch:
+            if isinstance(item, bytes):
+                frames.append(item)
+                continue
+            try:
+                frames.append(self.encoder(item))
+            except Exception as exc:
+                self.logger.debug("Failed to encode a log entry: %s", exc)
+                self.failed += 1
+        return frames
+
+    def _send(self, frames: List[bytes]) -> bool:
+        """
+        Send serialized messages, recording the outcome and retuning the
+            batch settings.
+
+        Args:
+          frames: A list of serialized GELF messages
+        Returns:
+          A boolean specifying whether the send succeeded.
+        """
+        started = time.monotonic()
+        ok = False
+        try:
+            if frames:
+                self.transport.send_frames(frames)
+            ok = True
+        except Exception as exc:
+            if self.last_error is None:
+                self.logger.warning(
+                    "Failed to ship %d log entries: %s", len(frames), exc
+                )
+            self.errors += 1
+            self.last_error = exc
+        else:
+            self.sent += len(frames)
+            self.last_error = None
+        finally:
+            if self.controller is not None:
+                self.batch_size, self.linger = self.controller.observe(
+                    len(frames),
+                    time.monotonic() - started,
+                    ok,
+                    self.queue.qsize(),
+                    self.queue.maxsize,
+                )
+        return ok
+
+    def _schedule(self, frames: List[bytes], attempt: int, items: int) -> bool:
+        """
+        Set a failed batch aside to be sent again, if the retry policy and
+            budget allow it.
+
+        Args:
+          frames: A list of serialized GELF messages
+          attempt: An integer specifying which retry this would be, from 1
+          items: An integer specifying how many queued items the batch holds
+        Returns:
+          A boolean specifying whether the batch will be retried.
+        """
+        policy = self.retry
+        if policy is None or not frames or attempt > policy.attempts:
+            return False
+        if not policy.budget.withdraw():
+            return False
+        due = time.monotonic() + policy.backoff(attempt)
+        heapq.heappush(
+            self._retries, (due, next(self._retry_order), attempt, frames, items)
+        )
+        self._retrying += len(frames)
+        return True
+
+    def _retry_due(self) -> bool:
+        """"""
+        return bool(self._retries) and self._retries[0][0] <= time.monotonic()
+
+    def _ship(self, batch: List[Any]) -> bool:
+        """
+        Encode and send a batch, setting it aside to retry if it fails.
+
+        Args:
+          batch: A list of queued items
+        Returns:
+          A boolean specifying whether the batch was set aside, in which
+              case its items stay unfinished.
+        """
+        frames = self._encode(batch)
+        if self.retry is not None:
+            self.retry.budget.deposit()
+        if self._send(frames):
+            return False
+        if self._schedule(frames, 1, len(batch)):
+            return True
+        self.failed += len(frames)
+        return False
+
+    def _ship_retry(self, final: bool = False) -> None:
+        """
+        Send the earliest batch set aside, rescheduling it if it fails again.
+
+        Args:
+          final: A boolean specifying whether to give up on the batch if this
+              attempt fails (optional, defaults to False)
+        Returns:
+          None
+        """
+        _, _, attempt, frames, items = heapq.heappop(self._retries)
+        self._retrying -= len(frames)
+        self.retried += len(frames)
+        if not self._send(frames):
+            if not final and self._schedule(frames, attempt + 1, items):
+                return
+            self.failed += len(frames)
+        for _ in range(items):
+            self.queue.task_done()
+
+    def _run(self) -> None:
+        """"""
+        while True:
+            batch = self._collect()
+            while self._retry_due():
+                self._ship_retry()
+            if not batch:
+                if not self._closed.is_set():
+                    continue
+                while self._retries:
+                    self._ship_retry(final=True)
+                return
+            set_aside = False
+            try:
+                set_aside = self._ship(batch)
+            finally:
+                if not set_aside:
+                    for _ in batch:
+                        self.queue.task_done()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued item has been shipped or given up on.
+
+        Args:
+          timeout: A float specifying the most seconds to wait (optional,
+              defaults to waiting indefinitely)
+        Returns:
+          A boolean specifying whether the queue drained in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                if deadline is None:
+                    self.queue.all_tasks_done.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Ship what is queued, then stop the worker thread and close the
+            transport.
+
+        Args:
+          timeout: A float specifying the most seconds to wait for the queue
+              to drain (optional, defaults to 5)
+        Returns:
+          None
+        """
+        self.flush(timeout)
+        self._closed.set()
+        self._thread.join(timeout)
+        close = getattr(self.transport, "close", None)
+        if close is not None:
+            close()
+
+    def stats(self) -> dict:
+        """
+        Report the pipeline's counters.
+
+        Args:
+          None
+        Returns:
+          A dict containing the queue depth, the sent, dropped, and failed
+              item counts, the failed send count, and the number of messages
+              retried and waiting to be retried.
+        """
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "errors": self.errors,
+            "retried": self.retried,
+            "retrying": self._retrying,
+        }
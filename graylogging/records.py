@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Optional
+
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+def _immutable(args: tuple) -> bool:
+    """
+    Checks whether formatting arguments can be rendered later with the same
+        result, i.e. are all strings, numbers, booleans, None, or tuples of
+        those. Subclasses are excluded as they may render differently.
+
+    Args:
+      args: A tuple of formatting arguments
+    Returns:
+      A boolean specifying whether every argument is an immutable primitive.
+    """
+    for arg in args:
+        if type(arg) is tuple:
+            if not _immutable(arg):
+                return False
+        elif type(arg) not in _IMMUTABLE:
+            return False
+    return True
+
+
+class CompactRecord:
+    """
+    The subset of a LogRecord that GraylogHandler needs to build a GELF
+    payload.
+
+    A LogRecord carries a `__dict__`, its `args`, and an `exc_info` traceback
+    that keeps every frame of the failing call stack alive. Buffered handlers
+    may hold thousands of records while Graylog is slow, so they capture this
+    slotted copy instead, and no reference to the original record is kept.
+
+    Rendering is deferred to whoever first reads `msg`, `exc_info`, or
+    `exc_text`, which for buffered handlers is the pipeline's worker thread.
+    A `%`-style message is kept unrendered when its arguments are immutable
+    primitives, and rendered at capture time otherwise, since mutable
+    arguments may change before the worker gets to them. Dict and list
+    messages are JSON-encoded. Tracebacks are reduced at capture time to a
+    summary of file names, line numbers, and functions, which releases their
+    frames; reading the source lines and formatting the text happens later.
+    A message whose arguments do not fit its format string is shipped as the
+    format string followed by the arguments' repr, with the error in
+    `render_error`, and reported on stderr as logging reports such errors.
+    """
+
+    __slots__ = (
+        "_msg",
+        "_args",
+        "_exception",
+        "_exc_info",
+        "_exc_text",
+        "render_error",
+        "levelname",
+        "created",
+        "stack_info",
+        "filename",
+        "lineno",
+        "module",
+        "name",
+        "pathname",
+        "processName",
+        "threadName",
+        "funcName",
+    )
+
+    def __init__(self, record: logging.LogRecord) -> None:
+        """
+        Capture a LogRecord.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          An instantiated CompactRecord object.
+        """
+        msg, args = record.msg, record.args
+        self._args = None
+        self.render_error = None
+        if isinstance(msg, (dict, list)) and not args:
+            # JSON payloads: encode them now rather than shipping their repr.
+            self._msg = json.dumps(msg, default=str)
+        elif type(msg) is str and type(args) is tuple and _immutable(args):
+            self._msg = msg
+            self._args = args or None
+        else:
+            self._msg = record.getMessage()
+        self.levelname = record.levelname
+        self.created = record.created
+        self.stack_info = record.stack_info
+        self._exception = None
+        self._exc_info = None
+        self._exc_text = record.exc_text
+        if record.exc_info and record.exc_info[0] is not None:
+            self._exception = traceback.TracebackException(
+                *record.exc_info, lookup_lines=False
+            )
+        self.filename = record.filename
+        self.lineno = record.lineno
+        self.module = record.module
+        self.name = record.name
+        self.pathname = record.pathname
+        self.processName = record.processName
+        self.threadName = record.threadName
+        self.funcName = record.funcName
+
+    @property
+    def msg(self) -> str:
+        """
+        The rendered message, rendered on first use.
+
+        Returns:
+          A string containing the message with its arguments merged in.
+        """
+        if self._args is not None:
+            msg, args = self._msg, self._args
+            try:
+                self._msg = msg % args
+            except (TypeError, ValueError) as exc:
+                self.render_error = f"{type(exc).__name__}: {exc}"
+                self._msg = f"{msg} {args!r}"
+                if logging.raiseExceptions:
+                    sys.stderr.write(
+                        f"--- Logging error ---\nFailed to render {msg!r} with"
+                        f" {args!r} from {self.pathname}:{self.lineno}:"
+                        f" {self.render_error}\n"
+                    )
+            self._args = None
+        return self._msg
+
+    def _render_exception(self) -> None:
+        """"""
+        exception, self._exception = self._exception, None
+        if exception is None:
+            return
+        self._exc_info = "".join(exception.format_exception_only()).strip()
+        if not self._exc_text:
+            self._exc_text = "".join(exception.format()).rstrip("\n")
+
+    @property
+    def exc_info(self) -> Optional[str]:
+        """
+        The exception's type and message, formatted on first use.
+
+        Returns:
+          A string such as `ValueError: bad value`, or None.
+        """
+        if self._exception is not None:
+            self._render_exception()
+        return self._exc_info
+
+    @property
+    def exc_text(self) -> Optional[str]:
+        """
+        The formatted traceback, formatted on first use.
+
+        Returns:
+          A string containing the traceback, or None.
+        """
+        if self._exception is not None:
+            self._render_exception()
+        return self._exc_text
+
+    def __getstate__(self) -> dict:
+        """
+        Renders the exception before pickling, as its summary refers to the
+            exception's class, which may not be importable elsewhere.
+
+        Args:
+          None
+        Returns:
+          A dict of the captured fields.
+        """
+        self._render_exception()
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        """"""
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+
+def location_fields(entry: CompactRecord) -> dict:
+    """
+    Collects the GELF fields describing where a record was logged from.
+
+    Args:
+      entry: A CompactRecord object
+    Returns:
+      A dict of the record's file, line, module, logger name, path, and
+          function fields.
+    """
+    fields = {
+        "_file": entry.filename,
+        "_line": entry.lineno,
+        "_module": entry.module,
+        "_name": entry.name,
+        "_path": entry.pathname,
+    }
+    if entry.funcName != "<module>":
+        fields["_function"] = entry.funcName
+    return fields
+
+
+class CallSiteCache:
+    """
+    A bounded LRU cache of pre-encoded JSON fragments holding the location
+    fields of each call site.
+
+    Every record logged from the same line of the same function by the same
+    logger carries identical location fields, so they are serialized once
+    per call site and spliced into each payload as raw bytes.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """
+        Initialize an empty cache.
+
+        Args:
+          maxsize: An integer specifying how many call sites to keep
+              (optional, defaults to 1024)
+        Returns:
+          An instantiated CallSiteCache object.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._fragments: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fragment(self, entry: CompactRecord) -> bytes:
+        """
+        Returns the encoded location fields of a record's call site.
+
+        Args:
+          entry: A CompactRecord object
+        Returns:
+          The JSON members for the location fields, without braces, e.g.
+              `"_file": "app.py", "_line": 12, ...`
+        """
+        key = (entry.pathname, entry.lineno, entry.funcName, entry.name)
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self.hits += 1
+                self._fragments.move_to_end(key)
+                return fragment
+            self.misses += 1
+        fragment = json.dumps(location_fields(entry))[1:-1].encode("utf-8")
+        with self._lock:
+            self._fragments[key] = fragment
+            if len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def stats(self) -> dict:
+        """
+        Report how well the cache is doing, to help size it.
+
+        Args:
+          None
+        Returns:
+          A dict containing the hit and miss counts and the current and
+              maximum number of cached call sites.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._fragments),
+                "maxsize": self.maxsize,
+            }
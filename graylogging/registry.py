@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from graylogging.pipeline import ShippingPipeline
+
+
+def encode_bound(item: Tuple[Callable[[Any], bytes], Any]) -> bytes:
+    """
+    Encodes an entry queued to a shared pipeline with the encoder of the
+        handler that queued it.
+
+    Args:
+      item: A tuple of the handler's encoder and the entry to encode
+    Returns:
+      A serialized GELF message.
+    """
+    encoder, entry = item
+    return encoder(entry)
+
+
+class _Entry:
+    """A shared pipeline and the number of handlers using it."""
+
+    __slots__ = ("pipeline", "refs")
+
+    def __init__(self, pipeline: ShippingPipeline) -> None:
+        self.pipeline = pipeline
+        self.refs = 0
+
+
+class PipelineRegistry:
+    """
+    Shipping pipelines shared by every handler pointing at the same Graylog
+    endpoint, keyed by transport, host, port, and TLS and wire settings.
+
+    Each handler acquires the pipeline for its endpoint and releases it when
+    it closes; the first acquisition creates the pipeline and its transport,
+    and the last release closes them. Handlers queue (encoder, entry) pairs,
+    so records are still formatted with each handler's own settings, while
+    the endpoint gets one connection and larger batches.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty registry.
+
+        Args:
+          None
+        Returns:
+          An instantiated PipelineRegistry object.
+        """
+        self._entries: Dict[tuple, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def acquire(
+        self, key: tuple, factory: Callable[[], ShippingPipeline]
+    ) -> ShippingPipeline:
+        """
+        Takes a reference to the pipeline for an endpoint, creating it if no
+            handler holds one.
+
+        Args:
+          key: A tuple identifying the endpoint
+          factory: A callable creating the pipeline, called at most once per
+              key while it is held
+        Returns:
+          The endpoint's ShippingPipeline object.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(factory())
+            entry.refs += 1
+            return entry.pipeline
+
+    def release(self, key: tuple) -> bool:
+        """
+        Drops a reference to an endpoint's pipeline, closing it if it was the
+            last.
+
+        Args:
+          key: A tuple identifying the endpoint
+        Returns:
+          A boolean specifying whether the pipeline was closed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.refs -= 1
+            if entry.refs > 0:
+                return False
+            del self._entries[key]
+        entry.pipeline.close()
+        return True
+
+    def stats(self) -> Dict[tuple, int]:
+        """
+        Report the endpoints with a shared pipeline.
+
+        Args:
+          None
+        Returns:
+          A dict mapping each endpoint's key to how many handlers share it.
+        """
+        with self._lock:
+            return {key: entry.refs for key, entry in self._entries.items()}
+
+
+shared_pipelines = PipelineRegistry()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Replays a GELF capture recorded by GraylogHandler(record_to=...) against a
+Graylog input, for capacity planning.
+
+Usage:
+  python -m graylogging.replay capture.gelfcap --host graylog --speed 10
+  graylogging-replay capture.gelfcap --host graylog --transport udp --speed 0
+"""
+
+import argparse
+import queue
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from graylogging.capture import read_capture
+from graylogging.graylogging import GraylogHandler
+
+
+class Replayer:
+    """
+    Sends the messages of a capture to a Graylog input at a multiple of the
+    rate they were recorded at.
+
+    A scheduler thread reads the capture and releases each message when its
+    scaled offset from the first message comes due; a pool of workers, each
+    with its own connection, ships whatever has been released in batches.
+    A speed of 0 sends as fast as the workers can go.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        host: str,
+        port: int,
+        transport: str = "tcp",
+        speed: float = 1.0,
+        workers: int = 4,
+        verify: bool = True,
+        loops: int = 1,
+    ) -> None:
+        """
+        Initialize a replayer.
+
+        Args:
+          path: A string specifying the capture file to replay
+          host: A string specifying the Graylog server
+          port: An integer specifying the GELF input port
+          transport: A string specifying the transport: tcp, udp, or http
+          speed: A float specifying the rate multiplier, or 0 for as fast as
+              possible (optional, defaults to 1)
+          workers: An integer specifying how many senders run in parallel
+              (optional, defaults to 4)
+          verify: A boolean specifying whether to verify the server's TLS cert
+          loops: An integer specifying how many times to play the capture
+        Returns:
+          An instantiated Replayer object.
+        Raises:
+          ValueError: The speed is negative or there are no workers
+        """
+        if speed < 0:
+            raise ValueError(f"{speed} is not a valid speed")
+        if workers < 1:
+            raise ValueError("At least one worker is required")
+        self.path = path
+        self.speed = speed
+        self.loops = loops
+        self.transports = [
+            GraylogHandler._new_transport(transport, host, port, verify)
+            for _ in range(workers)
+        ]
+        self.sent = 0
+        self.bytes = 0
+        self.errors = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=workers * 1000)
+
+    def _schedule(self) -> None:
+        """"""
+        started = time.monotonic()
+        elapsed = 0.0
+        for _ in range(self.loops):
+            first = None
+            for timestamp, frame in read_capture(self.path):
+                if first is None:
+                    first = timestamp
+                if self.speed:
+                    due = started + elapsed + max(timestamp - first, 0) / self.speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        self.max_lag = max(self.max_lag, -delay)
+                self._queue.put(frame)
+            if first is not None:
+                elapsed = time.monotonic() - started
+        for _ in self.transports:
+            self._queue.put(None)
+
+    def _work(self, graylog) -> None:
+        """"""
+        done = False
+        while not done:
+            batch = []
+            frame = self._queue.get()
+            while True:
+                if frame is None:
+                    # Each worker takes exactly one of the sentinels queued
+                    # by _schedule and leaves the rest for the others.
+                    done = True
+                    break
+                batch.append(frame)
+                if len(batch) >= 100:
+                    break
+                try:
+                    frame = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            try:
+                graylog.send_frames(batch)
+            except Exception:
+                with self._lock:
+                    self.errors += len(batch)
+            else:
+                with self._lock:
+                    self.sent += len(batch)
+                    self.bytes += sum(len(frame) for frame in batch)
+
+    def run(self) -> dict:
+        """
+        Replays the capture and waits for every message to be sent.
+
+        Args:
+          None
+        Returns:
+          A dict containing the sent, byte, and error counts, the achieved
+              message and byte rates, and the most the schedule fell behind.
+        """
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=self._work, args=(graylog,), daemon=True)
+            for graylog in self.transports
+        ]
+        for thread in threads:
+            thread.start()
+        self._schedule()
+        for thread in threads:
+            thread.join()
+        for graylog in self.transports:
+            graylog.close()
+        elapsed = max(time.monotonic() - started, 1e-9)
+        return {
+            "sent": self.sent,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "seconds": elapsed,
+            "messages_per_sec": self.sent / elapsed,
+            "bytes_per_sec": self.bytes / elapsed,
+            "max_lag": self.max_lag,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the replayer from the command line.
+
+    Args:
+      argv: A list of command line arguments (optional, defaults to sys.argv)
+    Returns:
+      An integer exit status: 0 if every message was sent, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        prog="graylogging-replay",
+        description="Replay a GELF capture against a Graylog input.",
+    )
+    parser.add_argument("capture", help="capture file written with record_to")
+    parser.add_argument("--host", required=True, help="Graylog server")
+    parser.add_argument("--port", type=int, default=12201, help="GELF input port")
+    parser.add_argument("--transport", choices=("tcp", "udp", "http"), default="tcp")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="rate multiplier, e.g. 20 for 20x; 0 sends as fast as possible",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="parallel senders")
+    parser.add_argument("--loops", type=int, default=1, help="times to replay")
+    parser.add_argument("--no-verify", dest="verify", action="store_false")
+    args = parser.parse_args(argv)
+    replayer = Replayer(
+        args.capture,
+        args.host,
+        args.port,
+        transport=args.transport,
+        speed=args.speed,
+        workers=args.workers,
+        verify=args.verify,
+        loops=args.loops,
+    )
+    stats = replayer.run()
+    print(
+        f"{stats['sent']} sent, {stats['errors']} errors in "
+        f"{stats['seconds']:.2f}s ({stats['messages_per_sec']:.0f} msg/s, "
+        f"{stats['bytes_per_sec'] / 1e6:.2f} MB/s, "
+        f"max lag {stats['max_lag']:.3f}s)",
+        file=sys.stderr,
+    )
+    return 0 if not stats["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
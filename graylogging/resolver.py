@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import socket
+import threading
+import time
+from typing import Dict, List, Tuple
+
+Address = Tuple[int, tuple]
+
+_RESOLVERS: Dict[Tuple[str, int, int], "EndpointResolver"] = {}
+_RESOLVERS_LOCK = threading.Lock()
+
+
+class EndpointResolver:
+    """
+    Resolves a Graylog endpoint once and caches every address returned,
+    IPv4 and IPv6 alike, for a fixed time.
+
+    Once the cached addresses expire they keep being served while a
+    background thread resolves the endpoint again, so no log record ever
+    waits on the system resolver after the first lookup. If a refresh fails
+    the previous addresses stay in use, and the next refresh is put off by a
+    delay that doubles with each consecutive failure, up to the TTL (or the
+    first delay, if that is longer). Failures are counted rather than
+    logged, as a log record could come straight back through the transport
+    doing the lookup.
+    """
+
+    # Seconds before the first retry of a failed refresh
+    RETRY_INTERVAL = 1.0
+
+    def __init__(self, host: str, port: int, socktype: int, ttl: float = 300.0):
+        """
+        Initialize a resolver. Nothing is resolved until first use.
+
+        Args:
+          host: A string specifying the hostname or address of the endpoint
+          port: An integer specifying the port of the endpoint
+          socktype: An integer specifying SOCK_STREAM or SOCK_DGRAM
+          ttl: A float specifying how many seconds addresses are cached
+              (optional, defaults to 300)
+        Returns:
+          An instantiated EndpointResolver object.
+        """
+        self.host = host
+        self.port = port
+        self.socktype = socktype
+        self.ttl = ttl
+        self.failures = 0
+        self.last_error = None
+        self._addresses: List[Address] = []
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _lookup(self) -> List[Address]:
+        """"""
+        infos = socket.getaddrinfo(self.host, self.port, 0, self.socktype)
+        return [(family, sockaddr) for family, _, _, _, sockaddr in infos]
+
+    def refresh(self) -> List[Address]:
+        """
+        Resolves the endpoint now, keeping the old addresses on failure.
+
+        Args:
+          None
+        Returns:
+          A list of (address family, socket address) tuples.
+        Raises:
+          OSError: The endpoint could not be resolved and nothing is cached
+        """
+        try:
+            addresses = self._lookup()
+        except OSError as exc:
+            with self._lock:
+                self._refreshing = False
+                self.failures += 1
+                self.last_error = exc
+                if not self._addresses:
+                    raise
+                retry = self.RETRY_INTERVAL * 2 ** min(self.failures - 1, 16)
+                retry = min(max(self.ttl, self.RETRY_INTERVAL), retry)
+                self._expires = time.monotonic() + retry
+                return self._addresses
+        with self._lock:
+            self._addresses = addresses
+            self._expires = time.monotonic() + self.ttl
+            self._refreshing = False
+            self.failures = 0
+            self.last_error = None
+        return addresses
+
+    def addresses(self) -> List[Address]:
+        """
+        Returns the cached addresses, resolving them inline only the first
+            time and refreshing them in the background once they expire.
+
+        Args:
+          None
+        Returns:
+          A list of (address family, socket address) tuples.
+        Raises:
+          OSError: The endpoint could not be resolved
+        """
+        with self._lock:
+            addresses = self._addresses
+            stale = time.monotonic() >= self._expires
+            if addresses and stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(
+                    target=self.refresh, name="graylogging-resolver", daemon=True
+                ).start()
+        if addresses:
+            return addresses
+        return self.refresh()
+
+
+def get_resolver(host: str, port: int, socktype: int) -> EndpointResolver:
+    """
+    Returns the process-wide resolver for an endpoint, so every transport
+        talking to it shares one cache.
+
+    Args:
+      host: A string specifying the hostname or address of the endpoint
+      port: An integer specifying the port of the endpoint
+      socktype: An integer specifying SOCK_STREAM or SOCK_DGRAM
+    Returns:
+      An EndpointResolver object.
+    """
+    key = (host, port, socktype)
+    with _RESOLVERS_LOCK:
+        if key not in _RESOLVERS:
+            _RESOLVERS[key] = EndpointResolver(host, port, socktype)
+        return _RESOLVERS[key]
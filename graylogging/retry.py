@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import itertools
+import os
+import random
+import threading
+from typing import Optional
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of first attempts, so a struggling Graylog is
+    not hit with a multiple of the normal traffic.
+
+    Every batch sent for the first time deposits `ratio` of a token, up to
+    `burst` tokens, and every retry withdraws one. When the balance runs
+    out, failed batches are given up on instead of retried.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 100.0) -> None:
+        """
+        Initialize a full budget.
+
+        Args:
+          ratio: A float specifying how many retries each first attempt earns
+              (optional, defaults to 0.1)
+          burst: A float specifying the most retries that may be saved up
+              (optional, defaults to 100)
+        Returns:
+          An instantiated RetryBudget object.
+        Raises:
+          ValueError: The ratio or burst is negative
+        """
+        if ratio < 0 or burst < 0:
+            raise ValueError(f"{ratio} and {burst} are not a valid retry budget")
+        self.ratio = ratio
+        self.burst = burst
+        self.balance = burst
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def deposit(self, count: int = 1) -> None:
+        """
+        Credit the budget for first attempts.
+
+        Args:
+          count: An integer specifying how many first attempts were made
+              (optional, defaults to 1)
+        Returns:
+          None
+        """
+        with self._lock:
+            self.balance = min(self.burst, self.balance + count * self.ratio)
+
+    def withdraw(self, count: int = 1) -> bool:
+        """
+        Take the budget for retries, if there is enough of it.
+
+        Args:
+          count: An integer specifying how many retries would be made
+              (optional, defaults to 1)
+        Returns:
+          A boolean specifying whether the retry may go ahead.
+        """
+        with self._lock:
+            if self.balance < count:
+                self.exhausted += count
+                return False
+            self.balance -= count
+            return True
+
+
+class RetryPolicy:
+    """
+    When and how often a ShippingPipeline retries a batch that failed to
+    send: up to `attempts` more times, each after an exponentially growing
+    delay with full jitter, while the retry budget allows.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base: float = 0.1,
+        cap: float = 5.0,
+        budget: Optional[RetryBudget] = None,
+    ) -> None:
+        """
+        Initialize a policy.
+
+        Args:
+          attempts: An integer specifying how many times a batch may be
+              retried (optional, defaults to 3)
+          base: A float specifying the longest delay, in seconds, before the
+              first retry (optional, defaults to 0.1)
+          cap: A float specifying the longest delay before any retry
+              (optional, defaults to 5)
+          budget: A RetryBudget shared by every batch (optional, defaults to
+              a new one retrying at most 10% of first attempts)
+        Returns:
+          An instantiated RetryPolicy object.
+        """
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Picks the delay before a retry.
+
+        Args:
+          attempt: An integer specifying which retry this is, from 1
+        Returns:
+          A float specifying a random number of seconds between 0 and the
+              exponential delay for this attempt, at most `cap`.
+        """
+        return random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+
+
+class MessageIds:
+    """
+    Issues ids unique to this process and handler, stamped on each message
+    as `_message_id` before its first send, so that a batch sent again after
+    a partial failure can be deduplicated downstream.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an id sequence with a random prefix.
+
+        Args:
+          None
+        Returns:
+          An instantiated MessageIds object.
+        """
+        self.prefix = os.urandom(6).hex()
+        self._counter = itertools.count()
+
+    def next(self) -> str:
+        """
+        Issues the next id.
+
+        Args:
+          None
+        Returns:
+          A string containing the prefix and a counter in hexadecimal.
+        """
+        return f"{self.prefix}-{next(self._counter):x}"
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+import logging
+import socket
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+from graylogging.fanout import GraylogFanoutHandler
+from graylogging.graylogging import GraylogHandler
+from graylogging.records import CompactRecord
+
+_MISSING = object()
+
+
+def _level_number(level: Any) -> int:
+    """
+    Converts a logging level name or number to its number.
+
+    Args:
+      level: A level name such as `ERROR`, or a level number
+    Returns:
+      An integer containing the level number.
+    Raises:
+      ValueError: {level} is not a valid logging level
+    """
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(str(level).upper())
+    if not isinstance(number, int):
+        raise ValueError(f"{level} is not a valid logging level")
+    return number
+
+
+class _Node:
+    """A logger name component in the routing trie."""
+
+    __slots__ = ("children", "rules")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.rules: List[Tuple[int, Tuple[Tuple[str, Any], ...], int]] = []
+
+
+class RoutingTable:
+    """
+    Routing rules compiled into a trie of logger name components, each node
+    holding the level threshold, field conditions, and destination of the
+    rules for that prefix.
+
+    Matching walks the record's logger name once. The result for each logger
+    name and level is cached, so a record is usually routed with one dict
+    lookup plus a check of any field conditions.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Tuple[str, int, Mapping, int]],
+        cache_size: int = 4096,
+    ) -> None:
+        """
+        Compile a set of rules.
+
+        Args:
+          rules: A sequence of (logger name prefix, minimum level number,
+              required record attributes, destination index) tuples; an
+              empty prefix matches every logger
+          cache_size: An integer specifying how many logger name and level
+              pairs to cache the matching rules of (optional, defaults to
+              4096)
+        Returns:
+          An instantiated RoutingTable object.
+        """
+        self.root = _Node()
+        self.cache_size = cache_size
+        self._cache: Dict[Tuple[str, int], tuple] = {}
+        for prefix, levelno, fields, destination in rules:
+            node = self.root
+            for part in prefix.split(".") if prefix else ():
+                node = node.children.setdefault(part, _Node())
+            node.rules.append((levelno, tuple(fields.items()), destination))
+
+    def _compile(self, name: str, levelno: int) -> tuple:
+        """"""
+        static = set()
+        conditional = []
+        node = self.root
+        nodes = [node]
+        for part in name.split("."):
+            node = node.children.get(part)
+            if node is None:
+                break
+            nodes.append(node)
+        for node in nodes:
+            for threshold, fields, destination in node.rules:
+                if levelno < threshold:
+                    continue
+                if fields:
+                    conditional.append((fields, destination))
+                else:
+                    static.add(destination)
+        return tuple(sorted(static)), tuple(conditional)
+
+    def match(self, record: logging.LogRecord) -> List[int]:
+        """
+        Finds the destinations of a record.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          A list of the indexes of every destination with a matching rule,
+              without repeats.
+        """
+        key = (record.name, record.levelno)
+        compiled = self._cache.get(key)
+        if compiled is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            compiled = self._cache[key] = self._compile(*key)
+        static, conditional = compiled
+        if not conditional:
+            return list(static)
+        destinations = list(static)
+        for fields, destination in conditional:
+            if destination in destinations:
+                continue
+            if all(getattr(record, k, _MISSING) == v for k, v in fields):
+                destinations.append(destination)
+        return destinations
+
+
+class GraylogRoutingHandler(GraylogFanoutHandler):
+    """
+    A handler class which sends each logging record to the Graylog inputs
+    whose routing rules it matches.
+
+    Rules match on logger name prefix, minimum level, and record attributes
+    (e.g. fields passed with `extra=`). Destinations are shared between
+    rules, each with its own pipeline as in GraylogFanoutHandler, and a
+    record matching several rules is formatted and serialized only once.
+    Records matching no rule are dropped.
+    """
+
+    def __init__(
+        self,
+        routes: Sequence[Mapping],
+        facility: int = GraylogHandler.LOG_USER,
+        hostname: str = socket.gethostname(),
+        appname: str = None,
+        queue_size: int = 10000,
+        trusted: bool = False,
+    ) -> None:
+        """
+        Initialize a handler.
+
+        Args:
+          routes: A sequence of dicts, each containing a `destination` dict
+              (the `host`, `port`, and `transport` of a Graylog input, and
+              optionally `verify` and `queue_size`) and optionally the
+              `logger` name prefix (defaults to every logger), the minimum
+              `level` (defaults to NOTSET), and `fields`, a dict of record
+              attributes that must be present with the given values
+          facility: An integer specifying the log facility to use (optional,
+              defaults to the value of LOG_USER: 1)
+          appname: A string specifying the name of the application that is
+              logging if different from `source` (optional)
+          queue_size: An integer specifying the default number of records
+              buffered per destination (optional, defaults to 10000)
+          trusted: A boolean specifying whether to skip validating the
+              payloads this handler builds from log records (optional,
+              defaults to False)
+        Returns:
+          An instantiated GraylogRoutingHandler object.
+        Raises:
+          ValueError: At least one route is required
+          ValueError: {level} is not a valid logging level
+        """
+        if not routes:
+            raise ValueError("At least one route is required")
+        destinations: List[Mapping] = []
+        indexes: Dict[tuple, int] = {}
+        rules = []
+        for route in routes:
+            dest = route["destination"]
+            key = (
+                dest.get("transport", "tcp"),
+                dest["host"],
+                dest.get("port"),
+                dest.get("verify", True),
+            )
+            if key not in indexes:
+                indexes[key] = len(destinations)
+                destinations.append(dest)
+            rules.append(
+                (
+                    route.get("logger") or "",
+                    _level_number(route.get("level", logging.NOTSET)),
+                    route.get("fields") or {},
+                    indexes[key],
+                )
+            )
+        super(GraylogRoutingHandler, self).__init__(
+            destinations,
+            facility=facility,
+            hostname=hostname,
+            appname=appname,
+            queue_size=queue_size,
+            trusted=trusted,
+        )
+        self.destinations = destinations
+        self.routes = RoutingTable(rules)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Serialize a record once and queue it to every matching destination.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          None
+        """
+        try:
+            destinations = self.routes.match(record)
+            if not destinations:
+                return
+            frame = self._encode_entry(CompactRecord(record))
+            for index in destinations:
+                self.pipelines[index].submit(frame)
+        except Exception:
+            self.handleError(record)
+
+    def route(self, record: logging.LogRecord) -> List[Mapping]:
+        """
+        Reports where a record would be sent, to check a set of rules.
+
+        Args:
+          record: A LogRecord object
+        Returns:
+          A list of the matching destination dicts, in configuration order.
+        """
+        return [self.destinations[i] for i in sorted(self.routes.match(record))]
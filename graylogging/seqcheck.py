@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Measures GELF delivery loss, reordering, and duplication from the `_seq` and
+`_seq_sender` fields stamped by GraylogHandler(sequence=True).
+
+Reads messages exported from Graylog as JSON lines or CSV, or listens for
+GELF over UDP itself, and reports per time window.
+
+Usage:
+  python -m graylogging.seqcheck export.csv --window 60
+  graylogging-seqcheck --listen 12201 --duration 300
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import socket
+import sys
+import time
+import zlib
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from graylogging.framing import CHUNK_HEADER_SIZE, CHUNK_MAGIC
+from graylogging.tools import parse_timestamp
+
+_SENDER_KEYS = ("_seq_sender", "seq_sender")
+_SEQ_KEYS = ("_seq", "seq")
+# Seconds to wait for the rest of a chunked message, as Graylog does
+CHUNK_TIMEOUT = 5.0
+# Most partial chunked messages to hold at once
+MAX_PARTIAL = 1000
+
+
+class _Sender:
+    """What has been seen from one sender."""
+
+    __slots__ = ("first", "highest", "seen", "order")
+
+    def __init__(self, seq: int) -> None:
+        self.first = seq
+        self.highest = seq - 1
+        self.seen: Set[int] = set()
+        self.order: Deque[int] = deque()
+
+
+class SequenceChecker:
+    """
+    Tallies sequence-stamped messages per sender and per time window.
+
+    A message is a duplicate if its sequence number was already seen, and
+    reordered if it arrives after a higher one from the same sender. Loss
+    is the part of each sender's sequence range never seen. Per window,
+    the expected count is how far each sender's highest sequence number
+    advanced, so a late arrival counts toward the window it arrives in.
+    """
+
+    def __init__(self, window: float = 60.0, horizon: int = 100000) -> None:
+        """
+        Initialize an empty checker.
+
+        Args:
+          window: A float specifying the length of a reporting window in
+              seconds (optional, defaults to 60)
+          horizon: An integer specifying how many sequence numbers per sender
+              are remembered to detect duplicates (optional, defaults to
+              100000)
+        Returns:
+          An instantiated SequenceChecker object.
+        """
+        self.window = window
+        self.horizon = horizon
+        self._senders: Dict[str, _Sender] = {}
+        self._windows: Dict[int, Dict[str, int]] = {}
+
+    def observe(self, sender: str, seq: int, timestamp: Optional[float] = None) -> None:
+        """
+        Account for one received message.
+
+        Args:
+          sender: A string containing the message's `_seq_sender`
+          seq: An integer containing the message's `_seq`
+          timestamp: A float specifying when the message was received
+              (optional, defaults to now)
+        Returns:
+          None
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        counts = self._windows.setdefault(
+            int(timestamp // self.window),
+            {"received": 0, "expected": 0, "duplicates": 0, "reordered": 0},
+        )
+        counts["received"] += 1
+        state = self._senders.get(sender)
+        if state is None:
+            state = self._senders[sender] = _Sender(seq)
+        if seq in state.seen:
+            counts["duplicates"] += 1
+            return
+        if seq < state.first:
+            counts["expected"] += state.first - seq
+            counts["reordered"] += 1
+            state.first = seq
+        elif seq < state.highest:
+            counts["reordered"] += 1
+        else:
+            counts["expected"] += seq - state.highest
+            state.highest = seq
+        state.seen.add(seq)
+        state.order.append(seq)
+        if len(state.order) > self.horizon:
+            state.seen.discard(state.order.popleft())
+
+    @staticmethod
+    def _rates(counts: Dict[str, int]) -> dict:
+        """"""
+        unique = counts["received"] - counts["duplicates"]
+        expected = counts["expected"]
+        lost = max(expected - unique, 0)
+        received = counts["received"] or 1
+        return {
+            **counts,
+            "lost": lost,
+            "loss_rate": lost / expected if expected else 0.0,
+            "reorder_rate": counts["reordered"] / received,
+            "duplicate_rate": counts["duplicates"] / received,
+        }
+
+    def windows(self) -> List[dict]:
+        """
+        Reports every window that received messages, oldest first.
+
+        Args:
+          None
+        Returns:
+          A list of dicts containing each window's start time, its received,
+              expected, lost, duplicate, and reordered counts, and its loss,
+              reorder, and duplicate rates.
+        """
+        return [
+            {"start": index * self.window, **self._rates(counts)}
+            for index, counts in sorted(self._windows.items())
+        ]
+
+    def summary(self) -> dict:
+        """
+        Reports the totals over every window.
+
+        Args:
+          None
+        Returns:
+          A dict containing the sender count and the counts and rates that
+              `windows` reports per window.
+        """
+        totals = {"received": 0, "expected": 0, "duplicates": 0, "reordered": 0}
+        for counts in self._windows.values():
+            for key in totals:
+                totals[key] += counts[key]
+        return {"senders": len(self._senders), **self._rates(totals)}
+
+
+def _stamp(message: dict) -> Optional[Tuple[str, int]]:
+    """"""
+    sender = next((message[k] for k in _SENDER_KEYS if message.get(k)), None)
+    seq = next(
+        (message[k] for k in _SEQ_KEYS if message.get(k) not in (None, "")), None
+    )
+    if sender is None or seq is None:
+        return None
+    try:
+        return str(sender), int(float(seq))
+    except ValueError:
+        return None
+
+
+def read_export(path: str) -> Iterator[dict]:
+    """
+    Reads messages exported from Graylog, as CSV or as JSON lines.
+
+    Args:
+      path: A string specifying the export file, or - for stdin
+    Returns:
+      An iterator of message dicts.
+    """
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def check(messages: Iterable[dict], window: float = 60.0) -> SequenceChecker:
+    """
+    Feeds sequence-stamped messages to a checker, using their timestamps.
+
+    Args:
+      messages: An iterable of message dicts
+      window: A float specifying the window length in seconds (optional,
+          defaults to 60)
+    Returns:
+      A SequenceChecker object holding the results.
+    """
+    checker = SequenceChecker(window)
+    for message in messages:
+        stamp = _stamp(message)
+        if stamp is not None:
+            checker.observe(*stamp, parse_timestamp(message.get("timestamp")))
+    return checker
+
+
+def _decode(data: bytes, chunks: dict, now: Optional[float] = None) -> Optional[dict]:
+    """
+    Decodes a GELF datagram, collecting chunks until their message is whole.
+        Partial messages are given up on after CHUNK_TIMEOUT seconds, as
+        Graylog does, and the oldest once there are more than MAX_PARTIAL.
+
+    Args:
+      data: The datagram's bytes
+      chunks: A dict of the partial messages received so far
+      now: A float specifying the current monotonic time (optional)
+    Returns:
+      The decoded message, or None while it is incomplete.
+    """
+    if data[:2] == CHUNK_MAGIC:
+        if now is None:
+            now = time.monotonic()
+        while chunks:
+            oldest = next(iter(chunks))
+            if now - chunks[oldest][0] < CHUNK_TIMEOUT and len(chunks) < MAX_PARTIAL:
+                break
+            del chunks[oldest]
+        message_id, seq, count = data[2:10], data[10], data[11]
+        parts = chunks.setdefault(message_id, (now, {}))[1]
+        parts[seq] = data[CHUNK_HEADER_SIZE:]
+        if len(parts) < count:
+            return None
+        del chunks[message_id]
+        data = b"".join(parts[i] for i in range(count))
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    elif data[:1] == b"\x78":
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def listen(port: int, duration: float, window: float = 60.0) -> SequenceChecker:
+    """
+    Receives GELF over UDP and checks the messages' sequence numbers as they
+        arrive.
+
+    Args:
+      port: An integer specifying the UDP port to listen on
+      duration: A float specifying how many seconds to listen for
+      window: A float specifying the window length in seconds (optional,
+          defaults to 60)
+    Returns:
+      A SequenceChecker object holding the results.
+    """
+    checker = SequenceChecker(window)
+    chunks: dict = {}
+    deadline = time.monotonic() + duration
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("", port))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            s.settimeout(remaining)
+            try:
+                data = s.recv(65535)
+            except socket.timeout:
+                break
+            try:
+                message = _decode(data, chunks)
+            except (OSError, ValueError, zlib.error):
+                continue
+            stamp = _stamp(message) if message else None
+            if stamp is not None:
+                checker.observe(*stamp)
+    return checker
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the checker from the command line.
+
+    Args:
+      argv: A list of command line arguments (optional, defaults to sys.argv)
+    Returns:
+      An integer exit status: 0 if nothing was lost, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        prog="graylogging-seqcheck",
+        description="Measure GELF loss, reordering, and duplication.",
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("export", nargs="?", help="Graylog export (.csv or JSON lines)")
+    source.add_argument("--listen", type=int, metavar="PORT", help="UDP port")
+    parser.add_argument(
+        "--duration", type=float, default=60.0, help="seconds to listen"
+    )
+    parser.add_argument("--window", type=float, default=60.0, help="window seconds")
+    args = parser.parse_args(argv)
+    if args.listen is not None:
+        checker = listen(args.listen, args.duration, args.window)
+    else:
+        checker = check(read_export(args.export), args.window)
+    for row in checker.windows() + [checker.summary()]:
+        label = "total" if "senders" in row else f"{row['start']:.0f}"
+        print(
+            f"{label:>12} {row['received']:>8} received {row['lost']:>6} lost "
+            f"({row['loss_rate']:.2%}) {row['reordered']:>6} reordered "
+            f"({row['reorder_rate']:.2%}) {row['duplicates']:>6} duplicates "
+            f"({row['duplicate_rate']:.2%})"
+        )
+    return 0 if not checker.summary()["lost"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import collections
+import threading
+from typing import Any, Callable, List, Optional
+
+
+class _Shard:
+    """One thread's buffer. Only the owning thread appends or counts drops."""
+
+    __slots__ = ("entries", "thread", "dropped")
+
+    def __init__(self, thread: threading.Thread) -> None:
+        self.entries: collections.deque = collections.deque()
+        self.thread = thread
+        self.dropped = 0
+
+
+class ShardedBuffer:
+    """
+    Per-thread buffers that logging threads append to without sharing a
+    lock, drained by a single flusher thread.
+
+    Each thread appends to its own deque; deque appends and pops from
+    opposite ends are atomic, so the only lock is taken once per thread to
+    register its shard. The flusher hands each shard's entries to `sink` as
+    one list, e.g. to a ShippingPipeline's submit_many, so the pipeline's
+    queue has one producer and one operation per shard per drain instead of
+    one per record. A thread whose shard is half full wakes the flusher
+    early rather than waiting for its next round, and a thread whose shard
+    is full hands its entries to the sink itself, waiting for the flusher if
+    it is mid-drain, so a busy thread is slowed down instead of losing
+    records.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[List[Any]], Any],
+        shard_size: int = 1000,
+        interval: float = 0.01,
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the buffers and start the flusher thread.
+
+        Args:
+          sink: A callable receiving lists of buffered entries, usually on the
+              flusher thread
+          shard_size: An integer specifying the most entries a thread may
+              buffer before it must hand them to the sink itself (optional,
+              defaults to 1000)
+          interval: A float specifying how many seconds the flusher sleeps
+              when every shard is empty (optional, defaults to 0.01)
+          name: A string naming the flusher thread (optional)
+        Returns:
+          An instantiated ShardedBuffer object.
+        """
+        self.sink = sink
+        self.shard_size = shard_size
+        self.interval = interval
+        self._high_water = max(1, shard_size // 2)
+        self._wake = threading.Event()
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._register_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._retired_drops = 0
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=name or "graylogging-shards", daemon=True
+        )
+        self._thread.start()
+
+    def _shard(self) -> _Shard:
+        """"""
+        shard = _Shard(threading.current_thread())
+        with self._register_lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def append(self, entry: Any) -> bool:
+        """
+        Buffer an entry from the calling thread.
+
+        Args:
+          entry: The entry to buffer
+        Returns:
+          A boolean specifying whether the entry was buffered, False once the
+              buffer is closed.
+        """
+        shard = getattr(self._local, "shard", None) or self._shard()
+        if self._closed.is_set():
+            shard.dropped += 1
+            return False
+        entries = shard.entries
+        if len(entries) >= self.shard_size:
+            with self._drain_lock:
+                self._drain_shard(shard)
+        entries.append(entry)
+        if len(entries) >= self._high_water and not self._wake.is_set():
+            self._wake.set()
+        return True
+
+    def _drain_shard(self, shard: _Shard) -> int:
+        """"""
+        entries = shard.entries
+        # Only the owning thread appends, so at least this many are there to
+        # pop.
+        count = len(entries)
+        if count:
+            popleft = entries.popleft
+            self.sink([popleft() for _ in range(count)])
+        return count
+
+    def _drain(self) -> int:
+        """
+        Hand every buffered entry to the sink, retiring the shards of threads
+            that have exited.
+
+        Args:
+          None
+        Returns:
+          An integer specifying how many entries were drained.
+        """
+        drained = 0
+        with self._drain_lock:
+            with self._register_lock:
+                shards = list(self._shards)
+            for shard in shards:
+                drained += self._drain_shard(shard)
+                if not shard.entries and not shard.thread.is_alive():
+                    with self._register_lock:
+                        self._shards.remove(shard)
+                        self._retired_drops += shard.dropped
+        return drained
+
+    def _run(self) -> None:
+        """"""
+        while not self._closed.is_set():
+            if not self._drain():
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+    def flush(self) -> None:
+        """
+        Hand what every thread has buffered so far to the sink.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        self._drain()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Stop the flusher and hand whatever is left to the sink.
+
+        Args:
+          timeout: A float specifying the most seconds to wait for the
+              flusher (optional, defaults to 5)
+        Returns:
+          None
+        """
+        self._closed.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._drain()
+
+    def stats(self) -> dict:
+        """
+        Report how many threads are buffering and how much they hold.
+
+        Args:
+          None
+        Returns:
+          A dict containing the shard count and the buffered and dropped
+              entry counts.
+        """
+        with self._register_lock:
+            shards = list(self._shards)
+            retired = self._retired_drops
+        return {
+            "shards": len(shards),
+            "buffered": sum(len(shard.entries) for shard in shards),
+            "dropped": retired + sum(shard.dropped for shard in shards),
+        }
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Ships log files or stdin to Graylog, for backfilling rotated logs or piping
+container output.
+
+Usage:
+  python -m graylogging --host graylog.contoso.com --port 12201 app.log.1
+  kubectl logs -f my-pod | graylogging-ship --host graylog --format json -
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from graylogging.batching import AdaptiveBatchController
+from graylogging.graylogging import GraylogFormatter, GraylogHandler
+from graylogging.pipeline import ShippingPipeline
+from graylogging.tools import (
+    COMPRESSION_METHODS,
+    parse_timestamp,
+    serialize_gelf,
+    validate_gelf_payload,
+)
+
+_MESSAGE_KEYS = ("short_message", "message", "msg")
+_TIMESTAMP_KEYS = ("timestamp", "time", "@timestamp", "ts")
+_HOST_KEYS = ("host", "hostname")
+_LEVEL_KEYS = ("level", "levelname", "severity")
+
+
+def _parse_level(value, default: str) -> str:
+    """
+    Maps a level from a log line to a GELF level name.
+
+    Args:
+      value: A syslog level number or a level name such as `warn` or `ERROR`
+      default: A string specifying the level to use when value is unknown
+    Returns:
+      A string containing the GELF level name.
+    """
+    try:
+        return GraylogHandler.encodeLogLevel(value)
+    except (TypeError, ValueError):
+        pass
+    priority = GraylogHandler.priority_names.get(str(value).lower())
+    if priority is None:
+        return default
+    return GraylogHandler.encodeLogLevel(priority)
+
+
+def _pop_first(fields: dict, keys: Tuple[str, ...]):
+    """"""
+    for key in keys:
+        if key in fields:
+            return fields.pop(key)
+    return None
+
+
+def line_to_payload(
+    line: str, fmt: str, hostname: str, appname: str, level: str = "INFO"
+) -> dict:
+    """
+    Maps one log line to a GELF payload.
+
+    JSON lines have their message, timestamp, host, and level read from the
+    usual keys; every other key becomes an additional field, prefixed with an
+    underscore where needed. Lines that aren't valid JSON objects are shipped
+    as plain text.
+
+    Args:
+      line: A string containing the log line, without its line ending
+      fmt: A string specifying the line format: plain or json
+      hostname: A string specifying the host to report if the line has none
+      appname: A string specifying the application name to report
+      level: A string specifying the level to use if the line has none
+        (optional, defaults to INFO)
+    Returns:
+      A GELF-formatted dictionary.
+    """
+    fields = None
+    if fmt == "json":
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            pass
+    if not isinstance(fields, dict):
+        return GraylogFormatter.format_record(
+            line, host=hostname, level=level, _appname=appname
+        )
+    short_message = _pop_first(fields, _MESSAGE_KEYS)
+    timestamp = parse_timestamp(_pop_first(fields, _TIMESTAMP_KEYS))
+    host = _pop_first(fields, _HOST_KEYS) or hostname
+    line_level = _pop_first(fields, _LEVEL_KEYS)
+    full_message = fields.pop("full_message", None)
+    extras = {}
+    for key, value in fields.items():
+        key = key if key.startswith("_") else f"_{key}"
+        if key == "_id":
+            key = "_id_"
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        extras[key] = value
+    return GraylogFormatter.format_record(
+        line if short_message is None else str(short_message),
+        host=str(host),
+        full_message=full_message,
+        timestamp=timestamp,
+        level=level if line_level is None else _parse_level(line_level, level),
+        _appname=appname,
+        **extras,
+    )
+
+
+def _encode_payload(payload: dict) -> bytes:
+    """"""
+    validate_gelf_payload(payload)
+    return serialize_gelf(payload)
+
+
+class _Source:
+    """A file, or stdin, read line by line from a byte offset."""
+
+    def __init__(self, path: str, offset: int = 0, inode: int = None) -> None:
+        self.path = path
+        self.offset = offset
+        self.inode = inode
+        self.fh: Optional[BinaryIO] = None
+
+    def open(self) -> None:
+        """
+        Opens the source, starting over if the file was rotated or truncated
+            since the saved offset was taken.
+        """
+        if self.path == "-":
+            self.fh = sys.stdin.buffer
+            return
+        self.fh = open(self.path, "rb")
+        stat = os.fstat(self.fh.fileno())
+        if self.inode != stat.st_ino or stat.st_size < self.offset:
+            self.offset = 0
+        self.inode = stat.st_ino
+        self.fh.seek(self.offset)
+
+    def close(self) -> None:
+        """"""
+        if self.fh is not None and self.fh is not sys.stdin.buffer:
+            self.fh.close()
+        self.fh = None
+
+    def rotated(self) -> bool:
+        """
+        Checks whether the path now points at a new or truncated file.
+        """
+        if self.path == "-":
+            return False
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_ino != self.inode or stat.st_size < self.offset
+
+    def lines(self, follow: bool) -> Iterator[str]:
+        """
+        Yields the lines available right now, advancing the offset past each.
+
+        Args:
+          follow: A boolean specifying whether a trailing partial line should
+              be left for a later call instead of being yielded
+        Returns:
+          An iterator of lines without their line endings.
+        """
+        while True:
+            raw = self.fh.readline()
+            if not raw:
+                return
+            if follow and not raw.endswith(b"\n"):
+                self.fh.seek(self.offset)
+                return
+            self.offset += len(raw)
+            line = raw.rstrip(b"\r\n").decode("utf-8", errors="replace")
+            if line:
+                yield line
+
+
+class Shipper:
+    """
+    Reads lines from files or stdin and ships them to Graylog through a set
+    of parallel ShippingPipelines.
+
+    Memory use is bounded by the pipelines' queues: reading blocks whenever
+    every worker is busy. Read offsets are saved to the state file at each
+    checkpoint, after the pipelines have drained, so an interrupted backfill
+    resumes where it left off. Once a batch has failed to ship, offsets are
+    no longer saved: the last saved state still precedes the lost lines, so
+    the next run ships them again.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        host: str,
+        port: int,
+        transport: str = "tcp",
+        fmt: str = "plain",
+        hostname: str = None,
+        appname: str = None,
+        level: str = "INFO",
+        verify: bool = True,
+        compress: Optional[str] = None,
+        workers: int = 1,
+        batch_size: int = 500,
+        queue_size: int = 10000,
+        state_file: Optional[str] = None,
+        follow: bool = False,
+        report_interval: float = 10.0,
+        report_to=sys.stderr,
+    ) -> None:
+        """
+        Initialize a shipper, resuming from the state file if there is one.
+
+        Args:
+          paths: A list of file paths to ship, with `-` meaning stdin
+          host: A string specifying the Graylog server
+          port: An integer specifying the GELF input port
+          transport: A string specifying the transport: tcp, udp, or http
+          fmt: A string specifying the line format: plain or json
+          hostname: A string specifying the source host to report (optional,
+              defaults to this machine's hostname)
+          appname: A string specifying the application name to report
+          level: A string specifying the level of lines that have none
+          verify: A boolean specifying whether to verify the server's TLS cert
+          compress: A string specifying gzip or zlib compression (optional,
+              UDP and HTTP only)
+          workers: An integer specifying how many senders run in parallel
+          batch_size: An integer specifying the largest batch a sender ships
+          queue_size: An integer specifying how many lines may be buffered
+          state_file: A string specifying where offsets are saved (optional)
+          follow: A boolean specifying whether to keep shipping lines
+              appended to the files
+          report_interval: A float specifying the seconds between throughput
+              reports and checkpoints
+          report_to: A file object reports are printed to, or None
+        Returns:
+          An instantiated Shipper object.
+        """
+        self.fmt = fmt
+        self.hostname = hostname or socket.gethostname()
+        self.appname = appname
+        self.level = GraylogHandler.encodeLogLevel(level)
+        self.follow = follow
+        self.state_file = state_file
+        self.report_interval = report_interval
+        self.report_to = report_to
+        state = self._load_state()
+        self.sources = [
+            _Source(path, *state.get(self._key(path), (0, None))) for path in paths
+        ]
+        self.pipelines = [
+            ShippingPipeline(
+                GraylogHandler._new_transport(transport, host, port, verify, compress),
+                encoder=_encode_payload,
+                queue_size=max(1, queue_size // workers),
+                name=f"graylogging-ship-{i}",
+                controller=AdaptiveBatchController((1, batch_size), (0.0, 0.2)),
+            )
+            for i in range(workers)
+        ]
+        self.lines = 0
+        self.bytes = 0
+        self.state_saved = True
+        self._started = time.monotonic()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        """"""
+        return os.path.abspath(path)
+
+    def _load_state(self) -> dict:
+        """"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, encoding="utf-8") as f:
+            return {
+                path: (entry["offset"], entry.get("inode"))
+                for path, entry in json.load(f).items()
+            }
+
+    def checkpoint(self) -> None:
+        """
+        Waits for the pipelines to drain, then saves every file's offset,
+            unless a batch has failed to ship since starting.
+        """
+        for pipeline in self.pipelines:
+            pipeline.flush()
+        if not self.state_file or not self.state_saved:
+            return
+        if any(pipeline.errors for pipeline in self.pipelines):
+            self.state_saved = False
+            if self.report_to is not None:
+                print(
+                    f"Failed to ship some lines; not updating {self.state_file} "
+                    "so they are shipped again on the next run",
+                    file=self.report_to,
+                )
+            return
+        state = {
+            self._key(source.path): {"offset": source.offset, "inode": source.inode}
+            for source in self.sources
+            if source.path != "-"
+        }
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    def stats(self) -> dict:
+        """
+        Reports how much has been read and shipped so far.
+
+        Returns:
+          A dict containing line, byte, and outcome counts and the line and
+              byte rates since starting.
+        """
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        totals = {"lines": self.lines, "bytes": self.bytes}
+        for key in ("sent", "dropped", "failed"):
+            totals[key] = sum(pipeline.stats()[key] for pipeline in self.pipelines)
+        totals["lines_per_sec"] = self.lines / elapsed
+        totals["bytes_per_sec"] = self.bytes / elapsed
+        return totals
+
+    def report(self) -> None:
+        """"""
+        if self.report_to is None:
+            return
+        stats = self.stats()
+        print(
+            f"{stats['lines']} lines read, {stats['sent']} sent, "
+            f"{stats['failed']} failed ({stats['lines_per_sec']:.0f} lines/s, "
+            f"{stats['bytes_per_sec'] / 1e6:.2f} MB/s)",
+            file=self.report_to,
+        )
+
+    def _ship_available(self, source: _Source) -> int:
+        """"""
+        shipped = 0
+        for line in source.lines(self.follow and source.path != "-"):
+            payload = line_to_payload(
+                line, self.fmt, self.hostname, self.appname, self.level
+            )
+            self.pipelines[self.lines % len(self.pipelines)].submit(payload, block=True)
+            self.lines += 1
+            self.bytes += len(line) + 1
+            shipped += 1
+            if time.monotonic() >= self._next_report:
+                self._periodic()
+        return shipped
+
+    def _periodic(self) -> None:
+        """"""
+        self.checkpoint()
+        self.report()
+        self._next_report = time.monotonic() + self.report_interval
+
+    def run(self) -> dict:
+        """
+        Ships every source, then keeps following files if asked to.
+
+        Returns:
+          A dict containing the final stats.
+        """
+        self._next_report = time.monotonic() + self.report_interval
+        for source in self.sources:
+            source.open()
+        try:
+            while True:
+                shipped = 0
+                for source in self.sources:
+                    shipped += self._ship_available(source)
+                    if self.follow and source.rotated():
+                        source.close()
+                        source.offset, source.inode = 0, None
+                        source.open()
+                if not self.follow:
+                    break
+                if not shipped:
+                    if time.monotonic() >= self._next_report:
+                        self._periodic()
+                    time.sleep(0.25)
+        finally:
+            self.checkpoint()
+            for source in self.sources:
+                source.close()
+            for pipeline in self.pipelines:
+                pipeline.close()
+            self.report()
+        return self.stats()
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    """"""
+    parser = argparse.ArgumentParser(
+        prog="graylogging-ship",
+        description="Ship log files or stdin to a Graylog GELF input.",
+    )
+    parser.add_argument(
+        "paths", nargs="*", default=["-"], help="files to ship, - for stdin"
+    )
+    parser.add_argument("--host", required=True, help="Graylog server")
+    parser.add_argument("--port", type=int, default=12201, help="GELF input port")
+    parser.add_argument("--transport", choices=("tcp", "udp", "http"), default="tcp")
+    parser.add_argument(
+        "--format",
+        dest="fmt",
+        choices=("plain", "json"),
+        default="plain",
+        help="plain text or JSON-lines input",
+    )
+    parser.add_argument("--hostname", help="source host to report")
+    parser.add_argument("--appname", help="application name to report")
+    parser.add_argument("--level", default="INFO", help="level for lines without one")
+    parser.add_argument(
+        "--compress", choices=COMPRESSION_METHODS, help="compress UDP or HTTP messages"
+    )
+    parser.add_argument("--no-verify", dest="verify", action="store_false")
+    parser.add_argument("--workers", type=int, default=1, help="parallel senders")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--state-file", help="file to save and resume offsets from")
+    parser.add_argument(
+        "-f", "--follow", action="store_true", help="keep shipping appended lines"
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=10.0,
+        help="seconds between throughput reports and checkpoints",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    try:
+        GraylogHandler.encodeLogLevel(args.level)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.compress and args.transport == "tcp":
+        parser.error("GELF over TCP does not support compression")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the shipper from the command line.
+
+    Args:
+      argv: A list of command line arguments (optional, defaults to sys.argv)
+    Returns:
+      An integer exit status: 0 if every line was shipped, 1 otherwise.
+    """
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    shipper = Shipper(
+        args.paths,
+        args.host,
+        args.port,
+        transport=args.transport,
+        fmt=args.fmt,
+        hostname=args.hostname,
+        appname=args.appname,
+        level=args.level,
+        verify=args.verify,
+        compress=args.compress,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        state_file=args.state_file,
+        follow=args.follow,
+        report_interval=args.report_interval,
+        report_to=None if args.quiet else sys.stderr,
+    )
+    try:
+        stats = shipper.run()
+    except KeyboardInterrupt:
+        return 130
+    return 0 if not stats["failed"] and not stats["dropped"] else 1
@@ -1,18 +1,97 @@
 #!/usr/bin/env python3
 
-import json
 import logging
 import socket
-from typing import Optional
+import threading
+from typing import Optional, Sequence
 
-from graylogging.tools import validate_gelf_payload
+from graylogging.framing import FrameBuffer
+from graylogging.resolver import get_resolver
+from graylogging.tools import serialize_gelf, validate_gelf_payload
 
 
 class TCPGELF:
-    def __init__(self, host: str, port: Optional[int] = 12201) -> None:
+    def __init__(
+        self, host: str, port: Optional[int] = 12201, timeout: float = 10.0
+    ) -> None:
         self.host = host
         self.port = port
+        self.timeout = timeout
         self.logger = logging.getLogger(__name__)
+        self.resolver = get_resolver(host, port, socket.SOCK_STREAM)
+        self._sock = None
+        self._lock = threading.Lock()
+        self._frames = FrameBuffer()
+
+    def connect(self) -> None:
+        """
+        Opens the connection to Graylog ahead of the first message, trying
+        every resolved address in turn. Does nothing if already connected.
+
+        Args:
+          None
+        Returns:
+          None
+        Raises:
+          OSError: Unable to connect to any address of the host.
+        """
+        with self._lock:
+            self._connect()
+
+    def _connect(self) -> socket.socket:
+        """"""
+        if self._sock is not None and not self._is_stale():
+            return self._sock
+        self._close()
+        error = OSError(f"{self.host} did not resolve to any address")
+        for family, sockaddr in self.resolver.addresses():
+            s = socket.socket(family, socket.SOCK_STREAM)
+            try:
+                s.settimeout(self.timeout)
+                s.connect(sockaddr)
+            except OSError as exc:
+                s.close()
+                error = exc
+                continue
+            self._sock = s
+            return s
+        raise error
+
+    def _is_stale(self) -> bool:
+        """
+        Checks whether the server closed the idle connection; Graylog never
+        writes to GELF clients, so a readable socket means EOF or an error.
+        Peeks without blocking rather than selecting, which fails for file
+        descriptors above FD_SETSIZE.
+        """
+        self._sock.setblocking(False)
+        try:
+            self._sock.recv(1, socket.MSG_PEEK)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        finally:
+            self._sock.settimeout(self.timeout)
+        return True
+
+    def _close(self) -> None:
+        """"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def close(self) -> None:
+        """
+        Closes the connection to Graylog, if open.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        with self._lock:
+            self._close()
 
     def push_log(self, payload: dict) -> None:
         """
@@ -25,17 +104,40 @@ class TCPGELF:
         Raises:
           OSError: Unable to create or use a TCP socket.
         """
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect((self.host, self.port))
-            log = json.dumps(payload).encode("gbk")
+        self.send_frames([serialize_gelf(payload)])
+
+    def send_frames(self, frames: Sequence[bytes]) -> None:
+        """
+        Sends already-serialized GELF messages over the connection, opening
+        it first if needed. The connection is dropped after a failure so the
+        next call reconnects.
+
+        Args:
+          frames: A sequence of JSON-encoded GELF messages, without framing
+        Returns:
+          None
+        Raises:
+          OSError: Unable to create or use a TCP socket.
+        """
+        with self._lock:
+            s = self._connect()
             try:
-                s.sendall(log + b"\0")
+                for segment in self._frames.frame(frames, "tcp"):
+                    s.sendall(segment)
             except OSError:
-                self.logger.exception("Failed to send the following log entry: %s", log)
-                pass
-            s.shutdown(1)
+                self._close()
+                raise
 
-    def send_gelf(self, payload: dict) -> None:
-        """"""
-        if validate_gelf_payload(payload):
+    def send_gelf(self, payload: dict, trusted: bool = False) -> None:
+        """
+        Validates a message, unless the caller vouches for it, and sends it.
+
+        Args:
+          payload: A dict containing the log message and metadata
+          trusted: A boolean specifying whether to skip validating a payload
+              the caller built itself (optional, defaults to False)
+        Returns:
+          None
+        """
+        if trusted or validate_gelf_payload(payload):
             return self.push_log(payload)
@@ -1,19 +1,116 @@
 #!/usr/bin/env python3
+import datetime
+import functools
+import gzip
+import json
+import zlib
+from typing import FrozenSet, Optional
 
+COMPRESSION_METHODS = ("gzip", "zlib")
 
-def validate_gelf_payload(payload: dict) -> bool:
-    """"""
-    required_keys = ["version", "host", "short_message"]
-    builtin_keys = required_keys + ["full_message", "timestamp", "level"]
-    for rkey in required_keys:
-        if rkey not in payload.keys():
-            raise KeyError(f"{rkey} is a required key!")
-    for key in payload.keys():
-        if key not in builtin_keys and not key.startswith("_"):
-            raise KeyError(
-                f"{rkey} is an invalid key. If using a custom field, it must begin"
+
+REQUIRED_KEYS = ("version", "host", "short_message")
+BUILTIN_KEYS = frozenset(REQUIRED_KEYS + ("full_message", "timestamp", "level"))
+
+
+@functools.lru_cache(maxsize=512)
+def _check_key_set(keys: FrozenSet[str]) -> Optional[str]:
+    """
+    Checks a set of GELF payload keys. Payloads from one source nearly always
+        share the same keys, so results are cached per key set.
+
+    Args:
+      keys: A frozenset of the keys of a GELF payload
+    Returns:
+      A string describing the first problem found, or None if the keys are
+          valid.
+    """
+    for rkey in REQUIRED_KEYS:
+        if rkey not in keys:
+            return f"{rkey} is a required key!"
+    for key in sorted(keys):
+        if key not in BUILTIN_KEYS and not key.startswith("_"):
+            return (
+                f"{key} is an invalid key. If using a custom field, it must begin"
                 " with an underscore (_)."
             )
-    if "_id" in payload.keys():
-        raise KeyError("_id is reserved for internal use.")
+    if "_id" in keys:
+        return "_id is reserved for internal use."
+    return None
+
+
+def validate_gelf_payload(payload: dict) -> bool:
+    """
+    Validate the GELF payload to make sure proper keys are included and no
+        reserved keys are used.
+
+    Args:
+      payload: A dictionary containing the GELF payload
+    Returns:
+      A boolean specifying whether the GELF payload is valid.
+    Raises:
+      KeyError: {rkey} is a required key!
+      KeyError: {key} is an invalid key. If using a custom field, it must
+          begin with an underscore (_).
+      KeyError: _id is reserved for internal use.
+    """
+    error = _check_key_set(frozenset(payload))
+    if error:
+        raise KeyError(error)
     return True
+
+
+def serialize_gelf(payload: dict) -> bytes:
+    """
+    Serializes a GELF payload into the bytes written to the wire.
+
+    Args:
+      payload: A dict containing a validated GELF payload
+    Returns:
+      The JSON-encoded payload as bytes, without any transport framing.
+    """
+    return json.dumps(payload).encode("utf-8")
+
+
+def compress_gelf(data: bytes, method: Optional[str]) -> bytes:
+    """
+    Compresses a serialized GELF message for transports that accept it.
+
+    Args:
+      data: The serialized GELF message
+      method: A string specifying the compression: gzip, zlib, or None
+    Returns:
+      The compressed message, or the message unchanged when method is None.
+    Raises:
+      ValueError: {method} is not a valid compression method
+    """
+    if method is None:
+        return data
+    if method == "gzip":
+        return gzip.compress(data)
+    if method == "zlib":
+        return zlib.compress(data)
+    raise ValueError(
+        f"{method} is not a valid compression method. Please choose one of "
+        f"{COMPRESSION_METHODS}"
+    )
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """
+    Converts an epoch or ISO 8601 timestamp to epoch seconds.
+
+    Args:
+      value: A number or string containing the timestamp
+    Returns:
+      A float containing the epoch timestamp, or None if it can't be parsed.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed.timestamp()
@@ -1,18 +1,85 @@
 #!/usr/bin/env python3
 
-import json
 import logging
+import os
 import socket
-from typing import Optional
+import threading
+from typing import Optional, Sequence
 
-from graylogging.tools import validate_gelf_payload
+from graylogging.framing import FrameBuffer
+from graylogging.resolver import get_resolver
+from graylogging.tools import compress_gelf, serialize_gelf, validate_gelf_payload
 
 
 class UDPGELF:
-    def __init__(self, host: str, port: Optional[int] = 12201) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: Optional[int] = 12201,
+        compress: Optional[str] = None,
+        chunk_size: int = 8192,
+        sequence: bool = False,
+    ) -> None:
         self.host = host
         self.port = port
+        self.compress = compress
+        self._frames = FrameBuffer(chunk_size)
+        self.sender_id = os.urandom(4).hex() if sequence else None
+        self.seq = 0
         self.logger = logging.getLogger(__name__)
+        self.resolver = get_resolver(host, port, socket.SOCK_DGRAM)
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> None:
+        """
+        Resolves the host and opens the socket ahead of the first message.
+
+        Args:
+          None
+        Returns:
+          None
+        Raises:
+          OSError: Unable to resolve the host or create a UDP socket
+        """
+        family = self.resolver.addresses()[0][0]
+        with self._lock:
+            self._socket(family)
+
+    def _socket(self, family: int) -> socket.socket:
+        """"""
+        if self._sock is None or self._sock.family != family:
+            self._close()
+            self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        return self._sock
+
+    def _close(self) -> None:
+        """"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def close(self) -> None:
+        """
+        Closes the socket, if open.
+
+        Args:
+          None
+        Returns:
+          None
+        """
+        with self._lock:
+            self._close()
+
+    def _stamp(self, frame: bytes) -> bytes:
+        """
+        Adds this sender's id and the next sequence number to a serialized
+            message, so a receiver can measure loss, reordering, and
+            duplication.
+        """
+        self.seq += 1
+        stamp = f', "_seq_sender": "{self.sender_id}", "_seq": {self.seq}}}'
+        return frame[: frame.rindex(b"}")] + stamp.encode("ascii")
 
     def push_logs(self, payload: dict) -> None:
         """
@@ -24,14 +91,42 @@ class UDPGELF:
         Raises:
           OSError: Failed to send log over the UDP socket
         """
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            log = json.dumps(payload).encode("gbk")
-            try:
-                s.sendto(log, (self.host, self.port))
-            except OSError:
-                self.logger.exception("Failed to send the following log entry: %s", log)
+        self.send_frames([serialize_gelf(payload)])
 
-    def send_gelf(self, payload: dict) -> None:
-        """"""
-        if validate_gelf_payload(payload):
+    def send_frames(self, frames: Sequence[bytes]) -> None:
+        """
+        Sends already-serialized GELF messages, compressing each if
+            configured to. Messages larger than the chunk size are sent as
+            GELF chunks; those needing more than 128 chunks are dropped.
+
+        Args:
+          frames: A sequence of JSON-encoded GELF messages
+        Returns:
+          None
+        Raises:
+          OSError: Failed to send a log over the UDP socket
+        """
+        family, sockaddr = self.resolver.addresses()[0]
+        with self._lock:
+            s = self._socket(family)
+            if self.sender_id is not None:
+                frames = [self._stamp(frame) for frame in frames]
+            datagrams = self._frames.frame(
+                (compress_gelf(frame, self.compress) for frame in frames), "udp"
+            )
+            for datagram in datagrams:
+                s.sendto(datagram, sockaddr)
+
+    def send_gelf(self, payload: dict, trusted: bool = False) -> None:
+        """
+        Validates a message, unless the caller vouches for it, and sends it.
+
+        Args:
+          payload: A dict containing the log message and metadata
+          trusted: A boolean specifying whether to skip validating a payload
+              the caller built itself (optional, defaults to False)
+        Returns:
+          None
+        """
+        if trusted or validate_gelf_payload(payload):
             return self.push_logs(payload)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from graylogging.records import CompactRecord
+
+
+class SpaceSaving:
+    """
+    A fixed-size stream summary of the heaviest keys, using the space-saving
+    algorithm (Metwally et al., 2005).
+
+    At most `capacity` keys are tracked. When a new key arrives and the table
+    is full, the lightest key is evicted and the newcomer inherits its weight
+    as an error bound. Any key whose true weight exceeds 1/capacity of the
+    total is guaranteed to be tracked, and every estimate overstates the true
+    weight by at most its recorded error.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """
+        Initialize an empty summary.
+
+        Args:
+          capacity: An integer specifying how many keys to track
+        Returns:
+          An instantiated SpaceSaving object.
+        Raises:
+          ValueError: The capacity is less than 1
+        """
+        if capacity < 1:
+            raise ValueError("At least one key must be tracked")
+        self.capacity = capacity
+        self.total = 0
+        self._weights: Dict[Hashable, List[int]] = {}
+
+    def add(self, key: Hashable, weight: int = 1) -> None:
+        """
+        Count `weight` more for a key.
+
+        Args:
+          key: A hashable key
+          weight: An integer specifying how much to add (optional, defaults
+              to 1)
+        Returns:
+          None
+        """
+        self.total += weight
+        counter = self._weights.get(key)
+        if counter is not None:
+            counter[0] += weight
+            return
+        if len(self._weights) < self.capacity:
+            self._weights[key] = [weight, 0]
+            return
+        victim = min(self._weights, key=lambda k: self._weights[k][0])
+        floor = self._weights.pop(victim)[0]
+        self._weights[key] = [floor + weight, floor]
+
+    def __len__(self) -> int:
+        """"""
+        return len(self._weights)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, int, int]]:
+        """
+        Lists the heaviest tracked keys.
+
+        Args:
+          n: An integer specifying how many keys to list (optional, defaults
+              to every tracked key)
+        Returns:
+          A list of (key, estimated weight, maximum overestimate) tuples,
+              heaviest first.
+        """
+        ranked = sorted(
+            ((key, weight, error) for key, (weight, error) in self._weights.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return ranked if n is None else ranked[:n]
+
+
+class CallSiteVolume:
+    """
+    Approximate per-call-site log volume, in records and serialized bytes,
+    kept in fixed memory so it can stay on in production.
+
+    Call sites are identified by logger name, file, and line. Two space-saving
+    summaries are kept, one weighted by records and one by bytes, so the
+    noisiest statements by either measure can be found at runtime.
+    """
+
+    def __init__(self, capacity: int = 100) -> None:
+        """
+        Initialize empty summaries.
+
+        Args:
+          capacity: An integer specifying how many call sites each summary
+              tracks (optional, defaults to 100)
+        Returns:
+          An instantiated CallSiteVolume object.
+        """
+        self.capacity = capacity
+        self._records = SpaceSaving(capacity)
+        self._bytes = SpaceSaving(capacity)
+        self._lock = threading.Lock()
+
+    def add(self, entry: CompactRecord, size: int) -> None:
+        """
+        Account for one shipped record.
+
+        Args:
+          entry: A CompactRecord object
+          size: An integer specifying the record's serialized size in bytes
+        Returns:
+          None
+        """
+        key = (entry.name, entry.filename, entry.lineno)
+        with self._lock:
+            self._records.add(key)
+            self._bytes.add(key, size)
+
+    def top(self, n: int = 10, by: str = "bytes") -> List[dict]:
+        """
+        Lists the noisiest call sites.
+
+        Args:
+          n: An integer specifying how many call sites to list (optional,
+              defaults to 10)
+          by: A string specifying the ranking: bytes or records (optional,
+              defaults to bytes)
+        Returns:
+          A list of dicts containing each call site's logger name, file, and
+              line, its estimated records and bytes, the most the ranking
+              estimate may be overstated by, and its share of the total.
+              A call site missing from the other summary reports None there.
+        Raises:
+          ValueError: {by} is not a valid ranking
+        """
+        if by not in ("bytes", "records"):
+            raise ValueError(f"{by} is not a valid ranking")
+        with self._lock:
+            ranking, other = self._bytes, self._records
+            other_name = "records"
+            if by == "records":
+                ranking, other = other, ranking
+                other_name = "bytes"
+            others = {key: weight for key, weight, _ in other.top()}
+            total = ranking.total
+            return [
+                {
+                    "name": name,
+                    "file": filename,
+                    "line": lineno,
+                    by: weight,
+                    other_name: others.get((name, filename, lineno)),
+                    "error": error,
+                    "share": weight / total if total else 0.0,
+                }
+                for (name, filename, lineno), weight, error in ranking.top(n)
+            ]
+
+    def stats(self) -> dict:
+        """
+        Report the totals the summaries were built from.
+
+        Args:
+          None
+        Returns:
+          A dict containing the total records and bytes accounted for and the
+              number of call sites tracked.
+        """
+        with self._lock:
+            return {
+                "records": self._records.total,
+                "bytes": self._bytes.total,
+                "tracked": len(self._records),
+                "capacity": self.capacity,
+            }
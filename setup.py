@@ -40,6 +40,13 @@ setup(
         "Programming Language :: Python :: 3.9",
     ],
     description=about["__description__"],
+    entry_points={
+        "console_scripts": [
+            "graylogging-ship=graylogging.shipper:main",
+            "graylogging-replay=graylogging.replay:main",
+            "graylogging-seqcheck=graylogging.seqcheck:main",
+        ],
+    },
     extras_require={"docs": ["Sphinx", "SimpleHTTPServer", "sphinx_rtd_theme"]},
     install_requires=["requests[security]"],
     long_description=readme,
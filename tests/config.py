@@ -0,0 +1,6 @@
+HOSTNAME = "localhost"
+SERVER = "127.0.0.1"
+HTTP_PORT = 1
+TCP_PORT = 1
+UDP_PORT = 1
+VERIFY = False
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""Local GELF receivers used to exercise the transports without a Graylog."""
+
+import gzip
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+import zlib
+
+
+class TCPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        buf = b""
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                break
+            buf += data
+            *frames, buf = buf.split(b"\0")
+            for frame in frames:
+                self.server.received.append(json.loads(frame))
+
+
+class UDPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = self.request[0]
+        if data[:2] == b"\x1e\x0f":
+            data = self._reassemble(data)
+            if data is None:
+                return
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+        elif data[:1] == b"\x78":
+            data = zlib.decompress(data)
+        self.server.received.append(json.loads(data))
+
+    def _reassemble(self, data):
+        chunks = self.server.__dict__.setdefault("chunks", {})
+        message_id, seq, count = data[2:10], data[10], data[11]
+        with self.server.lock:
+            parts = chunks.setdefault(message_id, {})
+            parts[seq] = data[12:]
+            if len(parts) < count:
+                return None
+            del chunks[message_id]
+        return b"".join(parts[i] for i in range(count))
+
+
+class Receiver:
+    def __init__(self, server_cls, handler_cls, host="127.0.0.1"):
+        self.server = server_cls((host, 0), handler_cls)
+        self.server.daemon_threads = True
+        self.server.received = []
+        self.server.lock = threading.Lock()
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def received(self):
+        return self.server.received
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _TCPServer6(socketserver.ThreadingTCPServer):
+    address_family = socket.AF_INET6
+
+
+def tcp_receiver(host="127.0.0.1"):
+    server_cls = _TCPServer6 if ":" in host else socketserver.ThreadingTCPServer
+    return Receiver(server_cls, TCPHandler, host=host)
+
+
+def udp_receiver():
+    return Receiver(socketserver.ThreadingUDPServer, UDPHandler)
+
+
+def closed_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(receiver, count, timeout=5.0):
+    """Waits until a receiver has `count` messages, then returns them all."""
+    deadline = time.monotonic() + timeout
+    while len(receiver.received) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return receiver.received
+
+
+def attach(handler, name=None):
+    """Returns a DEBUG logger whose only handler is `handler`."""
+    logger = logging.getLogger(name or f"tests.{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [handler]
+    return logger
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from graylogging.batching import AdaptiveBatchController
+from graylogging.graylogging import GraylogHandler
+from tests.receivers import attach, tcp_receiver
+
+
+def test_invalid_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveBatchController(batch_bounds=(0, 10))
+    with pytest.raises(ValueError):
+        AdaptiveBatchController(linger_bounds=(1.0, 0.5))
+
+
+def test_backlog_grows_batches_within_bounds():
+    ctl = AdaptiveBatchController(batch_bounds=(1, 64), linger_bounds=(0.0, 0.2))
+    for _ in range(20):
+        batch_size, linger = ctl.observe(ctl.batch_size, 0.1, True, 5000, 10000)
+    assert batch_size == 64
+    assert 0.0 < linger <= 0.2
+
+
+def test_idle_queue_shrinks_batches():
+    ctl = AdaptiveBatchController(batch_bounds=(1, 64), linger_bounds=(0.0, 0.2))
+    ctl.batch_size, ctl.linger = 64, 0.2
+    for _ in range(30):
+        batch_size, linger = ctl.observe(1, 0.001, True, 0, 10000)
+    assert batch_size <= 2
+    assert linger < 0.01
+
+
+def test_errors_back_off():
+    ctl = AdaptiveBatchController(batch_bounds=(1, 64), linger_bounds=(0.0, 0.2))
+    ctl.batch_size, ctl.linger = 64, 0.01
+    batch_size, linger = ctl.observe(64, 0.05, False, 0, 10000)
+    assert batch_size == 32
+    assert linger > 0.01
+    assert ctl.settings()["error_rate"] > 0
+
+
+def test_buffered_handler():
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="tcp", buffered=True
+    )
+    logger = attach(handler, "batching.buffered")
+    for i in range(50):
+        logger.warning("buffered")
+    handler.flush()
+    settings = handler.batch_settings()
+    handler.close()
+    receiver.close()
+    assert len(receiver.received) == 50
+    assert settings["sent"] == 50
+    assert 1 <= settings["batch_size"] <= 500
+
+
+def test_unbuffered_handler_has_no_batch_settings():
+    assert GraylogHandler("127.0.0.1", port=1).batch_settings() is None
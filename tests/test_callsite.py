@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import json
+import logging
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.records import CallSiteCache, CompactRecord
+
+HANDLER = GraylogHandler("127.0.0.1", port=1, appname="pytest")
+
+
+def _entry(lineno=10, func="handler", name="app"):
+    record = logging.LogRecord(
+        name, logging.INFO, "/srv/app.py", lineno, "hi", None, None, func=func
+    )
+    return CompactRecord(record)
+
+
+def test_encoded_entry_matches_payload():
+    entry = _entry()
+    encoded = json.loads(HANDLER._encode_entry(entry))
+    expected = json.loads(json.dumps(HANDLER._build_payload(entry)))
+    assert encoded == expected
+    assert encoded["_line"] == 10
+    assert encoded["_function"] == "handler"
+
+
+def test_module_level_call_site_has_no_function():
+    encoded = json.loads(HANDLER._encode_entry(_entry(func="<module>")))
+    assert "_function" not in encoded
+
+
+def test_hits_and_misses():
+    cache = CallSiteCache()
+    for _ in range(3):
+        cache.fragment(_entry())
+    cache.fragment(_entry(lineno=11))
+    cache.fragment(_entry(name="other"))
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+    assert stats["size"] == 3
+
+
+def test_cache_is_bounded():
+    cache = CallSiteCache(maxsize=2)
+    for lineno in range(5):
+        cache.fragment(_entry(lineno=lineno))
+    cache.fragment(_entry(lineno=4))
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hits"] == 1
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from graylogging.fanout import GraylogFanoutHandler
+from tests.receivers import attach, closed_port, tcp_receiver, udp_receiver
+
+
+@pytest.fixture
+def receivers():
+    tcp, udp = tcp_receiver(), udp_receiver()
+    yield tcp, udp
+    tcp.close()
+    udp.close()
+
+
+def test_no_destinations():
+    with pytest.raises(ValueError):
+        GraylogFanoutHandler([])
+
+
+def test_fanout_to_all_destinations(receivers):
+    tcp, udp = receivers
+    handler = GraylogFanoutHandler(
+        [
+            {"host": "127.0.0.1", "port": tcp.port, "transport": "tcp"},
+            {"host": "127.0.0.1", "port": udp.port, "transport": "udp"},
+        ],
+        appname="pytest",
+    )
+    logger = attach(handler)
+    for i in range(5):
+        logger.info("fanout %d", i)
+    handler.close()
+    assert len(tcp.received) == 5
+    assert len(udp.received) == 5
+    assert tcp.received[0] == udp.received[0]
+    assert [stats["sent"] for stats in handler.stats()] == [5, 5]
+
+
+def test_failing_destination_is_isolated(receivers):
+    tcp, _ = receivers
+    handler = GraylogFanoutHandler(
+        [
+            {"host": "127.0.0.1", "port": closed_port(), "transport": "tcp"},
+            {"host": "127.0.0.1", "port": tcp.port, "transport": "tcp"},
+        ]
+    )
+    logger = attach(handler)
+    logger.warning("still delivered")
+    handler.close()
+    dead, alive = handler.stats()
+    assert dead["failed"] == 1
+    assert alive["sent"] == 1
+    assert tcp.received[0]["short_message"] == "still delivered"
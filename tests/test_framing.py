@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import json
+
+import pytest
+
+from graylogging.framing import CHUNK_MAGIC, FrameBuffer
+from graylogging.graylogging import GraylogFormatter
+from graylogging.udp_client import UDPGELF
+from tests.receivers import udp_receiver, wait_for
+
+PAYLOADS = [{"version": "1.1", "host": "h", "short_message": str(i)} for i in range(3)]
+
+
+def test_tcp_batch_is_one_null_delimited_buffer():
+    (segment,) = GraylogFormatter().format_batch(PAYLOADS, "tcp")
+    frames = bytes(segment).split(b"\0")
+    assert frames[-1] == b""
+    assert [json.loads(f)["short_message"] for f in frames[:-1]] == ["0", "1", "2"]
+
+
+def test_http_batch_is_newline_delimited():
+    (segment,) = GraylogFormatter().format_batch(iter(PAYLOADS), "http")
+    assert bytes(segment).count(b"\n") == 3
+
+
+def test_segments_survive_the_next_batch():
+    formatter = GraylogFormatter()
+    (first,) = formatter.format_batch([b"a", b"b"])
+    formatter.format_batch([b"c"])
+    assert bytes(first) == b"a\0b\0"
+
+
+def test_released_buffer_is_reused_without_copying():
+    frames = FrameBuffer()
+    (segment,) = frames.frame([b"a"])
+    buffer = frames._buffer
+    assert segment.obj is buffer
+    del segment
+    (segment,) = frames.frame([b"b"])
+    assert frames._buffer is buffer
+    assert bytes(segment) == b"b\0"
+
+
+def test_udp_chunking():
+    frames = FrameBuffer(chunk_size=112)
+    message = bytes(range(256)) * 2
+    datagrams = frames.frame([b"small", message], "udp")
+    assert bytes(datagrams[0]) == b"small"
+    chunks = datagrams[1:]
+    assert len(chunks) == 6
+    assert all(len(chunk) <= 112 for chunk in chunks)
+    assert {bytes(chunk[:2]) for chunk in chunks} == {CHUNK_MAGIC}
+    assert len({bytes(chunk[2:10]) for chunk in chunks}) == 1
+    assert [(chunk[10], chunk[11]) for chunk in chunks] == [(i, 6) for i in range(6)]
+    assert b"".join(bytes(chunk[12:]) for chunk in chunks) == message
+
+
+def test_udp_message_too_large_is_skipped():
+    frames = FrameBuffer(chunk_size=13)
+    assert frames.frame([b"x" * 129], "udp") == []
+    assert frames.oversized == 1
+
+
+def test_stream_batches():
+    batches = list(GraylogFormatter().format_stream(iter([b"m"] * 5), batch_size=2))
+    assert [bytes(batch[0]) for batch in batches] == [b"m\0m\0", b"m\0m\0", b"m\0"]
+
+
+def test_invalid_framing():
+    with pytest.raises(ValueError):
+        GraylogFormatter().format_batch(PAYLOADS, "smtp")
+
+
+def test_udp_client_chunks_large_messages():
+    receiver = udp_receiver()
+    graylog = UDPGELF("127.0.0.1", receiver.port, chunk_size=1024)
+    payload = {"version": "1.1", "host": "h", "short_message": "x" * 5000}
+    graylog.send_gelf(payload)
+    received = wait_for(receiver, 1)
+    graylog.close()
+    receiver.close()
+    assert received == [payload]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import logging
+
+import pytest
+
+from graylogging.governor import LoadGovernor
+from graylogging.graylogging import GraylogHandler
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+def test_steps_up_one_level_at_a_time():
+    governor = LoadGovernor(raise_after=1.0)
+    assert governor.update(90, 100, 0.0, 0.0, now=0.0) == (
+        logging.DEBUG,
+        logging.INFO,
+    )
+    assert governor.update(90, 100, 0.0, 0.0, now=0.5) is None
+    assert governor.update(0, 100, 2.0, 0.0, now=1.0) == (
+        logging.INFO,
+        logging.WARNING,
+    )
+    assert governor.update(100, 100, 5.0, 1.0, now=5.0) is None
+    assert governor.min_level == logging.WARNING
+
+
+def test_restores_only_after_a_calm_hold():
+    governor = LoadGovernor(raise_after=0.0, hold=10.0)
+    governor.update(0, 100, 0.0, 0.5, now=0.0)
+    governor.update(0, 100, 0.0, 0.5, now=0.0)
+    assert governor.min_level == logging.WARNING
+    assert governor.update(30, 100, 0.0, 0.0, now=1.0) is None
+    assert governor.update(10, 100, 0.0, 0.0, now=2.0) is None
+    assert governor.update(50, 100, 0.0, 0.0, now=5.0) is None
+    assert governor.update(10, 100, 0.0, 0.0, now=6.0) is None
+    assert governor.update(10, 100, 0.0, 0.0, now=16.0) == (
+        logging.WARNING,
+        logging.INFO,
+    )
+    assert governor.update(10, 100, 0.0, 0.0, now=20.0) is None
+    assert governor.update(10, 100, 0.0, 0.0, now=26.0) == (
+        logging.INFO,
+        logging.DEBUG,
+    )
+    assert governor.stats()["transitions"] == 4
+
+
+def test_rejects_inverted_thresholds():
+    with pytest.raises(ValueError):
+        LoadGovernor(high=0.2, low=0.5)
+
+
+def test_handler_sheds_and_announces():
+    receiver = tcp_receiver()
+    handler = GraylogHandler("127.0.0.1", port=receiver.port, shed_load=True)
+    handler.governor.measure = lambda *args: 1.0
+    logger = attach(handler, "governor.handler")
+    logger.debug("shed")
+    logger.info("kept")
+    handler.flush()
+    messages = wait_for(receiver, 2)
+    assert [m["short_message"] for m in messages] == [
+        "Graylog shipping is falling behind: minimum level raised from DEBUG"
+        " to INFO",
+        "kept",
+    ]
+    assert messages[0]["_shed_min_level"] == "INFO"
+    settings = handler.batch_settings()
+    assert settings["min_level"] == "INFO"
+    assert settings["shed"] == 1
+    handler.close()
+    receiver.close()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+from graylogging.graylogging import GraylogHandler
+from tests.receivers import attach, closed_port, tcp_receiver, udp_receiver, wait_for
+
+
+def test_offloaded_handler_ships_from_subprocess():
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="tcp", appname="pytest", offload=True
+    )
+    logger = attach(handler)
+    for i in range(200):
+        logger.warning("offloaded %d", i)
+    assert handler.pipeline.flush(timeout=30)
+    stats = handler.batch_settings()
+    handler.close()
+    receiver.close()
+    assert stats["sent"] == 200
+    assert len(receiver.received) == 200
+    assert receiver.received[0]["_application"] == "pytest"
+
+
+def test_offloaded_compression():
+    receiver = udp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="udp", compress="zlib", offload=True
+    )
+    attach(handler).error("compressed")
+    handler.close()
+    received = wait_for(receiver, 1)
+    receiver.close()
+    assert received[0]["short_message"] == "compressed"
+
+
+def test_offload_failures_are_counted():
+    handler = GraylogHandler("127.0.0.1", port=closed_port(), offload=True)
+    attach(handler).error("nobody listening")
+    handler.pipeline.flush(timeout=30)
+    assert handler.batch_settings()["failed"] == 1
+    handler.close()
+
+
+def test_offloaded_send_and_transport():
+    receiver = tcp_receiver()
+    handler = GraylogHandler("127.0.0.1", port=receiver.port, offload=True)
+    handler.send({"version": "1.1", "host": "h", "short_message": "sent"})
+    frame = b'{"version": "1.1", "host": "h", "short_message": "handed off"}'
+    handler._transport().send_frames([frame])
+    assert handler.pipeline.flush(timeout=30)
+    assert handler.batch_settings()["failed"] == 0
+    handler.close()
+    received = wait_for(receiver, 2)
+    receiver.close()
+    assert sorted(p["short_message"] for p in received) == [
+        "handed off",
+        "sent",
+    ]
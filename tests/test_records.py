@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import gc
+import json
+import logging
+import pickle
+import sys
+import weakref
+
+import pytest
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.records import CompactRecord
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+class _Canary:
+    pass
+
+
+def _raise_with_local():
+    canary = _Canary()  # noqa: F841 - only reachable through the frame
+    raise ZeroDivisionError("division by zero")
+
+
+def _record(exc_info=None):
+    return logging.LogRecord(
+        "records", logging.ERROR, __file__, 42, "%s items", (3,), exc_info, func="f"
+    )
+
+
+def test_compact_record_fields():
+    entry = CompactRecord(_record())
+    assert entry.msg == "3 items"
+    assert entry.lineno == 42
+    assert entry.funcName == "f"
+    assert entry.exc_info is None
+    with pytest.raises(AttributeError):
+        entry.__dict__
+
+
+def test_compact_record_releases_traceback():
+    try:
+        _raise_with_local()
+    except ZeroDivisionError:
+        record = _record(sys.exc_info())
+    frame = record.exc_info[2].tb_next.tb_frame
+    canary = weakref.ref(frame.f_locals["canary"])
+    del frame
+    entry = CompactRecord(record)
+    del record
+    gc.collect()
+    assert canary() is None
+    assert entry.exc_info == "ZeroDivisionError: division by zero"
+    assert "_raise_with_local" in entry.exc_text
+
+
+def test_buffered_handler_ships_exceptions():
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="tcp", buffered=True
+    )
+    logger = attach(handler, "records.buffered")
+    try:
+        _raise_with_local()
+    except ZeroDivisionError:
+        logger.exception("failed after %d tries", 3)
+    handler.close()
+    (payload,) = wait_for(receiver, 1)
+    receiver.close()
+    assert payload["short_message"] == "failed after 3 tries"
+    assert payload["_exc_info"] == "ZeroDivisionError: division by zero"
+    assert "Traceback" in payload["_exc_text"]
+
+
+def test_json_payload_messages():
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="tcp", buffered=True
+    )
+    logger = attach(handler, "records.json")
+    logger.warning({"user": "alice", "items": [1, 2]})
+    handler.close()
+    (payload,) = wait_for(receiver, 1)
+    receiver.close()
+    assert json.loads(payload["short_message"]) == {"user": "alice", "items": [1, 2]}
+
+
+def _message_record(msg, args):
+    return logging.LogRecord("records", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_immutable_args_render_later():
+    entry = CompactRecord(_message_record("%s took %.1f ms (%s)", ("GET", 1.5, (1,))))
+    assert entry._args == ("GET", 1.5, (1,))
+    assert entry.msg == "GET took 1.5 ms ((1,))"
+    assert entry._args is None
+
+
+def test_mutable_args_render_at_capture():
+    items = ["a"]
+    entry = CompactRecord(_message_record("items: %s %s", (items, ("b", items))))
+    items.append("changed")
+    assert entry._args is None
+    assert entry.msg == "items: ['a'] ('b', ['a'])"
+
+
+def test_exception_text_renders_later():
+    try:
+        _raise_with_local()
+    except ZeroDivisionError:
+        record = _record(sys.exc_info())
+    expected = logging.Formatter().formatException(record.exc_info)
+    entry = CompactRecord(record)
+    assert entry._exception is not None
+    assert entry.exc_text == expected
+    assert entry.exc_info == "ZeroDivisionError: division by zero"
+
+
+def test_pickles_with_a_local_exception():
+    class LocalError(Exception):
+        pass
+
+    try:
+        raise LocalError("not importable")
+    except LocalError:
+        record = _record(sys.exc_info())
+    entry = pickle.loads(pickle.dumps(CompactRecord(record)))
+    assert entry.msg == "3 items"
+    assert entry.exc_info.endswith("LocalError: not importable")
+    assert "Traceback" in entry.exc_text
+
+
+def test_bad_arguments_are_shipped_and_reported(capsys):
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="tcp", buffered=True
+    )
+    logger = attach(handler, "records.render")
+    logger.info("count %d", "x")
+    handler.close()
+    (payload,) = wait_for(receiver, 1)
+    receiver.close()
+    assert payload["short_message"] == "count %d ('x',)"
+    assert payload["_render_error"].startswith("TypeError:")
+    assert "Failed to render 'count %d'" in capsys.readouterr().err
+    assert handler.batch_settings()["failed"] == 0
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.registry import PipelineRegistry, shared_pipelines
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+class _Pipeline:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_last_release_closes():
+    registry = PipelineRegistry()
+    created = []
+
+    def factory():
+        created.append(_Pipeline())
+        return created[-1]
+
+    first = registry.acquire(("tcp", "a", 1), factory)
+    assert registry.acquire(("tcp", "a", 1), factory) is first
+    assert registry.acquire(("tcp", "b", 1), factory) is not first
+    assert registry.stats() == {("tcp", "a", 1): 2, ("tcp", "b", 1): 1}
+    assert not registry.release(("tcp", "a", 1))
+    assert not first.closed
+    assert registry.release(("tcp", "a", 1))
+    assert first.closed
+    assert registry.stats() == {("tcp", "b", 1): 1}
+
+
+def test_handlers_share_one_pipeline():
+    receiver = tcp_receiver()
+    handlers = [
+        GraylogHandler("127.0.0.1", port=receiver.port, appname=f"app{i}", shared=True)
+        for i in range(3)
+    ]
+    pipeline = handlers[0].pipeline
+    assert all(handler.pipeline is pipeline for handler in handlers)
+    for i, handler in enumerate(handlers):
+        attach(handler, f"registry.{i}").warning("from %d", i)
+    handlers[0].close()
+    handlers[0].close()
+    assert not pipeline._closed.is_set()
+    handlers[1].close()
+    handlers[2].close()
+    assert pipeline._closed.is_set()
+    messages = wait_for(receiver, 3)
+    assert sorted(m["_application"] for m in messages) == ["app0", "app1", "app2"]
+    assert not any(key[2] == receiver.port for key in shared_pipelines.stats())
+    receiver.close()
+
+
+def test_shared_rejects_offload():
+    with pytest.raises(ValueError):
+        GraylogHandler("127.0.0.1", port=12201, shared=True, offload=True)
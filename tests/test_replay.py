@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import json
+
+import pytest
+
+from graylogging.capture import CaptureWriter, read_capture
+from graylogging.graylogging import GraylogHandler
+from graylogging.replay import Replayer, main
+from tests.receivers import attach, closed_port, tcp_receiver, udp_receiver, wait_for
+
+
+def _capture(path, count, spacing=0.01):
+    writer = CaptureWriter(str(path))
+    for i in range(count):
+        frame = json.dumps({"version": "1.1", "host": "h", "short_message": str(i)})
+        writer.write(frame.encode(), 1000.0 + i * spacing)
+    writer.close()
+
+
+def test_capture_round_trip(tmp_path):
+    _capture(tmp_path / "c.gelfcap", 3)
+    entries = list(read_capture(str(tmp_path / "c.gelfcap")))
+    assert [ts for ts, _ in entries] == [1000.0, 1000.01, 1000.02]
+    assert json.loads(entries[2][1])["short_message"] == "2"
+
+
+def test_not_a_capture(tmp_path):
+    path = tmp_path / "bogus"
+    path.write_bytes(b"nope")
+    with pytest.raises(ValueError):
+        list(read_capture(str(path)))
+
+
+def test_handler_records_what_it_ships(tmp_path):
+    receiver = tcp_receiver()
+    path = str(tmp_path / "rec.gelfcap")
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, buffered=True, record_to=path
+    )
+    logger = attach(handler, "replay.record")
+    for i in range(10):
+        logger.warning("recorded %d", i)
+    handler.close()
+    received = wait_for(receiver, 10)
+    receiver.close()
+    recorded = [json.loads(frame) for _, frame in read_capture(path)]
+    assert recorded == received
+
+
+def test_replay_at_speed(tmp_path):
+    path = tmp_path / "c.gelfcap"
+    _capture(path, 20, spacing=0.05)
+    receiver = udp_receiver()
+    stats = Replayer(
+        str(path), "127.0.0.1", receiver.port, transport="udp", speed=10, workers=2
+    ).run()
+    received = wait_for(receiver, 20)
+    receiver.close()
+    assert stats["sent"] == 20
+    assert len(received) == 20
+    # 0.95s of traffic at 10x is paced over at least 0.095s
+    assert stats["seconds"] >= 0.09
+
+
+def test_replay_cli_reports_errors(tmp_path):
+    path = tmp_path / "c.gelfcap"
+    _capture(path, 5)
+    args = [str(path), "--host", "127.0.0.1", "--port", str(closed_port())]
+    assert main(args + ["--speed", "0", "--loops", "2"]) == 1
+
+
+def test_unbuffered_handler_records_what_it_ships(tmp_path):
+    receiver = tcp_receiver()
+    path = str(tmp_path / "rec.gelfcap")
+    handler = GraylogHandler("127.0.0.1", port=receiver.port, record_to=path)
+    logger = attach(handler, "replay.record.direct")
+    logger.warning("recorded %s", {"a": 1})
+    received = wait_for(receiver, 1)
+    handler.close()
+    receiver.close()
+    recorded = [json.loads(frame) for _, frame in read_capture(path)]
+    assert recorded == received
+    assert recorded[0]["_file"] == "test_replay.py"
+
+
+@pytest.mark.parametrize("buffered", [False, True])
+def test_sent_payloads_are_recorded(tmp_path, buffered):
+    receiver = tcp_receiver()
+    path = str(tmp_path / "send.gelfcap")
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, buffered=buffered, record_to=path
+    )
+    handler.send({"version": "1.1", "host": "h", "short_message": "sent"})
+    handler.flush()
+    received = wait_for(receiver, 1)
+    handler.close()
+    receiver.close()
+    recorded = [json.loads(frame) for _, frame in read_capture(path)]
+    assert recorded == received
+    assert recorded[0]["short_message"] == "sent"
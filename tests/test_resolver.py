@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import socket
+import time
+
+import pytest
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.resolver import EndpointResolver
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+class _CountingResolver(EndpointResolver):
+    lookups = 0
+
+    def _lookup(self):
+        self.lookups += 1
+        return super()._lookup()
+
+
+def test_addresses_are_cached():
+    resolver = _CountingResolver("localhost", 12201, socket.SOCK_STREAM)
+    for _ in range(5):
+        assert resolver.addresses()
+    assert resolver.lookups == 1
+
+
+def test_expired_addresses_refresh_in_background():
+    resolver = _CountingResolver("localhost", 12201, socket.SOCK_STREAM, ttl=0)
+    first = resolver.addresses()
+    assert resolver.addresses() == first
+    deadline = time.monotonic() + 5
+    while resolver.lookups < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert resolver.lookups == 2
+
+
+def test_unresolvable_host():
+    resolver = EndpointResolver("invalid.invalid", 12201, socket.SOCK_STREAM)
+    with pytest.raises(OSError):
+        resolver.addresses()
+
+
+def test_prewarmed_connection_is_reused():
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="tcp", prewarm=True
+    )
+    sock = handler._graylog._sock
+    assert sock is not None
+    logger = attach(handler, "resolver.prewarm")
+    logger.warning("first")
+    logger.warning("second")
+    assert handler._graylog._sock is sock
+    handler.close()
+    receiver.close()
+
+
+@pytest.mark.skipif(not socket.has_ipv6, reason="IPv6 is not available")
+def test_ipv6_endpoint():
+    try:
+        receiver = tcp_receiver(host="::1")
+    except OSError:
+        pytest.skip("IPv6 loopback is not configured")
+    handler = GraylogHandler("::1", port=receiver.port, transport="tcp")
+    logger = attach(handler, "resolver.ipv6")
+    logger.warning("over IPv6")
+    handler.close()
+    received = wait_for(receiver, 1)
+    receiver.close()
+    assert received[0]["short_message"] == "over IPv6"
+
+
+class _FailingResolver(_CountingResolver):
+    fail = False
+
+    def _lookup(self):
+        if self.fail:
+            self.lookups += 1
+            raise OSError("Temporary failure in name resolution")
+        return super()._lookup()
+
+
+def test_failed_refresh_backs_off(caplog):
+    resolver = _FailingResolver("localhost", 12201, socket.SOCK_STREAM, ttl=0)
+    first = resolver.addresses()
+    resolver.fail = True
+    deadline = time.monotonic() + 0.5
+    while time.monotonic() < deadline:
+        assert resolver.addresses() == first
+        time.sleep(0.001)
+    assert resolver.lookups == 2
+    assert resolver.failures == 1
+    assert isinstance(resolver.last_error, OSError)
+    assert not caplog.records
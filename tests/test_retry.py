@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import threading
+import time
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.pipeline import ShippingPipeline
+from graylogging.retry import RetryBudget, RetryPolicy
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+class _FlakyTransport:
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_frames(self, frames):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise OSError("connection reset")
+            self.sent.append(list(frames))
+
+
+def _policy(delay, **kwargs):
+    policy = RetryPolicy(**kwargs)
+    policy.backoff = lambda attempt: delay
+    return policy
+
+
+def test_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, burst=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit(3)
+    assert budget.balance == 1.5
+    budget.deposit(10)
+    assert budget.balance == 2
+    assert budget.exhausted == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(base=0.1, cap=0.5)
+    for attempt in range(1, 8):
+        delay = policy.backoff(attempt)
+        assert 0 <= delay <= min(0.5, 0.1 * 2 ** (attempt - 1))
+
+
+def test_new_records_ship_while_a_retry_waits():
+    transport = _FlakyTransport(failures=1)
+    pipeline = ShippingPipeline(transport, linger=0.0, retry=_policy(0.3))
+    pipeline.submit(b"first")
+    while not pipeline.stats()["retrying"]:
+        time.sleep(0.01)
+    pipeline.submit(b"second")
+    assert pipeline.flush(timeout=5)
+    assert transport.sent == [[b"second"], [b"first"]]
+    stats = pipeline.stats()
+    assert (stats["sent"], stats["retried"], stats["failed"]) == (2, 1, 0)
+    pipeline.close()
+
+
+def test_gives_up_after_the_last_attempt():
+    transport = _FlakyTransport(failures=10)
+    pipeline = ShippingPipeline(transport, retry=_policy(0.0, attempts=2))
+    pipeline.submit(b"lost")
+    assert pipeline.flush(timeout=5)
+    stats = pipeline.stats()
+    assert (stats["errors"], stats["retried"], stats["failed"]) == (3, 2, 1)
+    pipeline.close()
+
+
+def test_exhausted_budget_fails_at_once():
+    transport = _FlakyTransport(failures=10)
+    budget = RetryBudget(ratio=0.0, burst=0.0)
+    pipeline = ShippingPipeline(transport, retry=_policy(0.0, budget=budget))
+    pipeline.submit(b"lost")
+    assert pipeline.flush(timeout=5)
+    assert pipeline.stats()["retried"] == 0
+    assert pipeline.stats()["failed"] == 1
+    pipeline.close()
+
+
+def test_close_makes_a_final_attempt():
+    transport = _FlakyTransport(failures=1)
+    pipeline = ShippingPipeline(transport, retry=_policy(60.0))
+    pipeline.submit(b"late")
+    pipeline.close(timeout=0.5)
+    assert transport.sent == [[b"late"]]
+
+
+def test_handler_stamps_message_ids():
+    receiver = tcp_receiver()
+    handler = GraylogHandler("127.0.0.1", port=receiver.port, retry=True)
+    logger = attach(handler, "retry.handler")
+    for i in range(5):
+        logger.warning("message %d", i)
+    handler.flush()
+    messages = wait_for(receiver, 5)
+    ids = [m["_message_id"] for m in messages]
+    assert len(set(ids)) == 5
+    assert all(i.startswith(handler.message_ids.prefix) for i in ids)
+    handler.close()
+    receiver.close()
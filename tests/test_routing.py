@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import logging
+
+import pytest
+
+from graylogging.routing import GraylogRoutingHandler, RoutingTable
+from tests.receivers import attach, tcp_receiver, udp_receiver, wait_for
+
+
+def _record(name, level, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, "routed", None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_prefix_level_and_fields():
+    table = RoutingTable(
+        [
+            ("payments", logging.ERROR, {}, 0),
+            ("", logging.NOTSET, {}, 1),
+            ("app", logging.INFO, {"audit": True}, 2),
+        ]
+    )
+    assert table.match(_record("payments.card", logging.ERROR)) == [0, 1]
+    assert table.match(_record("payments.card", logging.INFO)) == [1]
+    assert table.match(_record("paymentsx", logging.ERROR)) == [1]
+    assert table.match(_record("app.users", logging.INFO, audit=True)) == [1, 2]
+    assert table.match(_record("app.users", logging.INFO, audit=False)) == [1]
+
+
+def test_matches_are_cached():
+    table = RoutingTable([("a", logging.WARNING, {}, 0)])
+    table.match(_record("a.b", logging.ERROR))
+    table.match(_record("a.b", logging.ERROR))
+    assert list(table._cache) == [("a.b", logging.ERROR)]
+
+
+def test_invalid_routes():
+    with pytest.raises(ValueError):
+        GraylogRoutingHandler([])
+    with pytest.raises(ValueError):
+        GraylogRoutingHandler(
+            [{"destination": {"host": "127.0.0.1", "port": 1}, "level": "LOUD"}]
+        )
+
+
+def test_routing_handler_dispatches():
+    tcp, udp = tcp_receiver(), udp_receiver()
+    secure = {"host": "127.0.0.1", "port": tcp.port, "transport": "tcp"}
+    bulk = {"host": "127.0.0.1", "port": udp.port, "transport": "udp"}
+    handler = GraylogRoutingHandler(
+        [
+            {"destination": secure, "logger": "payments", "level": "ERROR"},
+            {"destination": bulk, "level": logging.DEBUG},
+            {"destination": secure, "fields": {"audit": True}},
+        ]
+    )
+    assert len(handler.pipelines) == 2
+    attach(handler, "payments.card").error("declined")
+    attach(handler, "payments.card").info("authorized")
+    attach(handler, "users").info("login", extra={"audit": True})
+    handler.close()
+    secure_received = wait_for(tcp, 2)
+    bulk_received = wait_for(udp, 3)
+    tcp.close()
+    udp.close()
+    assert sorted(m["short_message"] for m in secure_received) == ["declined", "login"]
+    assert len(bulk_received) == 3
+    assert handler.route(_record("payments", logging.CRITICAL)) == [secure, bulk]
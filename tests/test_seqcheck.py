@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import json
+
+import pytest
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.framing import CHUNK_MAGIC
+from graylogging.seqcheck import MAX_PARTIAL, SequenceChecker, _decode, check, main
+from tests.receivers import attach, udp_receiver, wait_for
+
+
+def test_loss_reorder_and_duplicates():
+    checker = SequenceChecker(window=10)
+    for seq, ts in [(1, 0), (2, 1), (4, 2), (3, 3), (4, 4), (6, 12), (7, 13)]:
+        checker.observe("a", seq, ts)
+    first, second = checker.windows()
+    assert (first["expected"], first["lost"]) == (4, 0)
+    assert (first["reordered"], first["duplicates"]) == (1, 1)
+    assert (second["start"], second["expected"], second["lost"]) == (10, 3, 1)
+    total = checker.summary()
+    assert total["lost"] == 1
+    assert total["loss_rate"] == pytest.approx(1 / 7)
+
+
+def test_senders_are_independent():
+    checker = SequenceChecker()
+    for sender in ("a", "b"):
+        for seq in (10, 11, 12):
+            checker.observe(sender, seq, 0)
+    assert checker.summary()["senders"] == 2
+    assert checker.summary()["lost"] == 0
+
+
+def test_handler_stamps_sequence_numbers():
+    receiver = udp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, transport="udp", sequence=True
+    )
+    logger = attach(handler, "seqcheck.handler")
+    for i in range(20):
+        logger.info("stamped %d", i)
+    sender = handler._transport().sender_id
+    handler.close()
+    received = wait_for(receiver, 20)
+    receiver.close()
+    assert sorted(m["_seq"] for m in received) == list(range(1, 21))
+    assert {m["_seq_sender"] for m in received} == {sender}
+    summary = check(received).summary()
+    assert summary["received"] == 20
+    assert summary["lost"] == 0
+
+
+def test_sequence_requires_udp():
+    with pytest.raises(ValueError):
+        GraylogHandler("127.0.0.1", port=1, transport="tcp", sequence=True)
+
+
+def test_cli_reports_loss(tmp_path, capsys):
+    export = tmp_path / "export.json"
+    rows = [
+        {"timestamp": "2021-06-01T12:00:00Z", "seq_sender": "a", "seq": s}
+        for s in (1, 3)
+    ]
+    export.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    assert main([str(export)]) == 1
+    assert "1 lost" in capsys.readouterr().out
+
+
+def test_cli_reads_csv(tmp_path):
+    export = tmp_path / "export.csv"
+    export.write_text(
+        "timestamp,seq_sender,seq\n"
+        "2021-06-01T12:00:00.000Z,a,1\n"
+        "2021-06-01T12:00:01.000Z,a,2\n"
+    )
+    assert main([str(export)]) == 0
+
+
+def _chunk(message_id, seq, count, data):
+    return CHUNK_MAGIC + message_id.to_bytes(8, "big") + bytes([seq, count]) + data
+
+
+def test_partial_chunk_sets_expire():
+    chunks = {}
+    assert _decode(_chunk(1, 0, 2, b'{"a":'), chunks, now=0.0) is None
+    assert _decode(_chunk(2, 0, 2, b'{"b":'), chunks, now=4.0) is None
+    assert _decode(_chunk(2, 1, 2, b"2}"), chunks, now=6.0) == {"b": 2}
+    assert chunks == {}
+    for i in range(MAX_PARTIAL + 10):
+        _decode(_chunk(i, 0, 2, b"{"), chunks, now=7.0)
+    assert len(chunks) == MAX_PARTIAL
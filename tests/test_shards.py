@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import threading
+import time
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.pipeline import ShippingPipeline
+from graylogging.shards import ShardedBuffer
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+class _Recorder:
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_frames(self, frames):
+        with self.lock:
+            self.sent.append(list(frames))
+
+
+def test_every_thread_is_drained():
+    drained = []
+    buffer = ShardedBuffer(drained.extend)
+
+    def log(n):
+        for i in range(500):
+            buffer.append((n, i))
+
+    threads = [threading.Thread(target=log, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    buffer.close()
+    assert len(drained) == 4000
+    assert [i for n, i in drained if n == 3] == list(range(500))
+    assert buffer.stats() == {"shards": 0, "buffered": 0, "dropped": 0}
+
+
+def test_bulk_submit_counts_items():
+    transport = _Recorder()
+    pipeline = ShippingPipeline(transport, queue_size=5, batch_size=100, linger=0.2)
+    with transport.lock:
+        assert pipeline.submit_many([b"1", b"2", b"3"]) == 3
+        assert pipeline.submit(b"4")
+        while pipeline.stats()["queued"]:
+            time.sleep(0.01)
+        assert pipeline.submit_many([b"5", b"6", b"7", b"8", b"9"]) == 5
+        assert pipeline.submit_many([b"x"]) == 0
+    assert pipeline.flush(timeout=5)
+    assert sum(transport.sent, []) == [str(i).encode() for i in range(1, 10)]
+    assert pipeline.stats()["dropped"] == 1
+    pipeline.close()
+
+
+def test_full_shard_waits_instead_of_dropping():
+    entered, release = threading.Event(), threading.Event()
+    drained = []
+
+    def sink(entries):
+        entered.set()
+        release.wait(5)
+        drained.extend(entries)
+
+    buffer = ShardedBuffer(sink, shard_size=2)
+    buffer.append("held by the flusher")
+    assert entered.wait(5)
+    thread = threading.Thread(target=lambda: [buffer.append(c) for c in "abc"])
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive()
+    release.set()
+    thread.join(5)
+    buffer.close()
+    assert drained == ["held by the flusher", "a", "b", "c"]
+    assert buffer.stats()["dropped"] == 0
+    assert not buffer.append("closed")
+
+
+def test_sharded_handler_skips_the_handler_lock():
+    receiver = tcp_receiver()
+    handler = GraylogHandler("127.0.0.1", port=receiver.port, sharded=True)
+    logger = attach(handler, "shards.handler")
+    with handler.lock:
+        thread = threading.Thread(
+            target=lambda: [logger.info("sharded %d", i) for i in range(100)]
+        )
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+    handler.flush()
+    assert handler.batch_settings()["sent"] == 100
+    handler.close()
+    assert len(wait_for(receiver, 100)) == 100
+    receiver.close()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import json
+
+import pytest
+
+from graylogging.shipper import Shipper, line_to_payload, main
+from tests.receivers import closed_port, tcp_receiver, udp_receiver, wait_for
+
+
+@pytest.fixture
+def receiver():
+    server = tcp_receiver()
+    yield server
+    server.close()
+
+
+def test_plain_line():
+    payload = line_to_payload("disk almost full", "plain", "web1", "app", "WARNING")
+    assert payload["short_message"] == "disk almost full"
+    assert payload["host"] == "web1"
+    assert payload["level"] == "WARNING"
+
+
+def test_json_line():
+    line = json.dumps(
+        {
+            "message": "user logged in",
+            "time": "2021-06-01T12:00:00Z",
+            "level": "warn",
+            "user": {"id": 7},
+            "_id": "abc",
+            "latency_ms": 12,
+        }
+    )
+    payload = line_to_payload(line, "json", "web1", "app")
+    assert payload["short_message"] == "user logged in"
+    assert payload["timestamp"] == 1622548800.0
+    assert payload["level"] == "WARNING"
+    assert payload["_user"] == '{"id": 7}'
+    assert payload["_id_"] == "abc"
+    assert payload["_latency_ms"] == 12
+
+
+def test_invalid_json_line_is_shipped_as_text():
+    payload = line_to_payload("{not json", "json", "web1", "app")
+    assert payload["short_message"] == "{not json"
+
+
+def test_ship_file_and_resume(receiver, tmp_path):
+    log = tmp_path / "app.log"
+    state = tmp_path / "state.json"
+    log.write_text("".join(f"line {i}\n" for i in range(100)))
+    args = ["--host", "127.0.0.1", "--port", str(receiver.port), "-q"]
+    args += ["--workers", "3", "--state-file", str(state), str(log)]
+    assert main(args) == 0
+    assert len(wait_for(receiver, 100)) == 100
+    with log.open("a") as f:
+        f.write("line 100\n")
+    assert main(args) == 0
+    received = wait_for(receiver, 101)
+    assert len(received) == 101
+    assert received[-1]["short_message"] == "line 100"
+
+
+def test_ship_compressed_udp(tmp_path):
+    server = udp_receiver()
+    log = tmp_path / "app.jsonl"
+    log.write_text('{"msg": "one"}\n{"msg": "two"}\n')
+    shipper = Shipper(
+        [str(log)],
+        "127.0.0.1",
+        server.port,
+        transport="udp",
+        fmt="json",
+        compress="gzip",
+        report_to=None,
+    )
+    stats = shipper.run()
+    received = wait_for(server, 2)
+    server.close()
+    assert stats["sent"] == 2
+    assert sorted(p["short_message"] for p in received) == ["one", "two"]
+
+
+def test_tcp_compression_rejected():
+    with pytest.raises(SystemExit):
+        main(["--host", "127.0.0.1", "--compress", "gzip"])
+
+
+def test_failed_lines_are_not_checkpointed(tmp_path):
+    log = tmp_path / "app.log"
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({str(log): {"offset": 0, "inode": None}}))
+    log.write_text("lost 1\nlost 2\n")
+    args = ["--host", "127.0.0.1", "--port", str(closed_port()), "-q"]
+    assert main(args + ["--state-file", str(state), str(log)]) == 1
+    assert json.loads(state.read_text())[str(log)]["offset"] == 0
+
+
+def test_invalid_level_rejected(capsys):
+    with pytest.raises(SystemExit):
+        main(["--host", "127.0.0.1", "--level", "bogus"])
+    assert "bogus is not a valid log level" in capsys.readouterr().err
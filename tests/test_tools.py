@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from graylogging.tools import _check_key_set, validate_gelf_payload
+
+PAYLOAD = {"version": "1.1", "host": "web1", "short_message": "hi", "_foo": 1}
+
+
+def test_invalid_key_is_named_in_error():
+    with pytest.raises(KeyError, match="bogus is an invalid key"):
+        validate_gelf_payload({**PAYLOAD, "bogus": True})
+
+
+def test_missing_key_is_named_in_error():
+    payload = dict(PAYLOAD)
+    payload.pop("host")
+    with pytest.raises(KeyError, match="host is a required key"):
+        validate_gelf_payload(payload)
+
+
+def test_results_are_cached_per_key_set():
+    _check_key_set.cache_clear()
+    for i in range(10):
+        assert validate_gelf_payload({**PAYLOAD, "short_message": str(i)})
+    info = _check_key_set.cache_info()
+    assert info.misses == 1
+    assert info.hits == 9
+
+
+def test_cached_failures_still_raise():
+    for _ in range(2):
+        with pytest.raises(KeyError):
+            validate_gelf_payload({**PAYLOAD, "_id": 1})
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import logging
+import os
+
+import pytest
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.tcp_client import TCPGELF
+from graylogging.udp_client import UDPGELF
+from tests.receivers import closed_port, tcp_receiver
+
+
+class _FailingHandler(GraylogHandler):
+    errors = 0
+
+    def handleError(self, record):
+        self.errors += 1
+
+
+def test_push_failures_propagate():
+    with pytest.raises(OSError):
+        TCPGELF("127.0.0.1", closed_port()).push_log({"short_message": "lost"})
+    with pytest.raises(OSError):
+        UDPGELF("127.0.0.1", 0).push_logs({"short_message": "lost"})
+
+
+def test_unreachable_server_on_root_logger():
+    handler = _FailingHandler("127.0.0.1", port=closed_port(), transport="tcp")
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        logging.getLogger("transports.root").error("Graylog is down")
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+    assert handler.errors == 1
+
+
+def test_connection_reused_with_high_file_descriptors():
+    receiver = tcp_receiver()
+    padding = []
+    try:
+        while not padding or padding[-1] < 1100:
+            padding.append(os.dup(0))
+    except OSError:
+        pytest.skip("not enough file descriptors available")
+    try:
+        graylog = TCPGELF("127.0.0.1", receiver.port)
+        graylog.connect()
+        sock = graylog._sock
+        assert sock.fileno() >= 1024
+        graylog.send_frames([b'{"short_message": "high fd"}'])
+        assert graylog._sock is sock
+        graylog.close()
+    finally:
+        for fd in padding:
+            os.close(fd)
+        receiver.close()
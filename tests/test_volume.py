@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+import pytest
+
+from graylogging.graylogging import GraylogHandler
+from graylogging.volume import CallSiteVolume, SpaceSaving
+from tests.receivers import attach, tcp_receiver, wait_for
+
+
+def test_exact_below_capacity():
+    sketch = SpaceSaving(4)
+    for key, weight in [("a", 5), ("b", 1), ("a", 2), ("c", 3)]:
+        sketch.add(key, weight)
+    assert sketch.top() == [("a", 7, 0), ("c", 3, 0), ("b", 1, 0)]
+    assert sketch.total == 11
+
+
+def test_heavy_hitter_survives_churn():
+    sketch = SpaceSaving(10)
+    for i in range(5000):
+        sketch.add(f"noise-{i}")
+        if i % 4 == 0:
+            sketch.add("heavy")
+    (key, weight, error), *_ = sketch.top(1)
+    assert key == "heavy"
+    assert weight - error <= 1250 <= weight
+    assert len(sketch) == 10
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        SpaceSaving(0)
+
+
+def test_handler_tracks_noisiest_call_sites():
+    receiver = tcp_receiver()
+    handler = GraylogHandler(
+        "127.0.0.1", port=receiver.port, buffered=True, volume_top_k=5
+    )
+    logger = attach(handler, "volume.handler")
+    for _ in range(20):
+        logger.info("short")
+    for _ in range(5):
+        logger.info("x" * 5000)
+    handler.close()
+    wait_for(receiver, 25)
+    receiver.close()
+    by_bytes = handler.volume.top(by="bytes")
+    by_records = handler.volume.top(by="records")
+    assert by_bytes[0]["records"] == 5
+    assert by_records[0]["records"] == 20
+    assert by_records[0]["line"] < by_bytes[0]["line"]
+    assert by_bytes[0]["file"] == "test_volume.py"
+    assert handler.volume.stats()["records"] == 25
+
+
+def test_invalid_ranking():
+    with pytest.raises(ValueError):
+        CallSiteVolume().top(by="lines")
+
+
+def test_volume_can_be_disabled():
+    assert GraylogHandler("127.0.0.1", port=1, volume_top_k=0).volume is None